@@ -1,27 +1,50 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Request, Response, g, has_request_context, request, jsonify, make_response, send_file, send_from_directory, abort
 from flask_cors import CORS
 import random
 import json
 import os
-from database import Database
-from werkzeug.utils import secure_filename
-import cv2
+import backup
+from read_cache import VersionedCache
+from database import PoolTimeout
+from image_pipeline import ImagePipeline, choose_variant
+from json_provider import FastJSONProvider
+from photo_gc import PhotoCollector
+from photo_store import BytesLRU, MAX_PHOTO_BYTES
+from raffles import RaffleRegistry
+from metrics import Registry
+from werkzeug.local import LocalProxy
 import base64
+import csv
+import hashlib
+import io
+import mimetypes
+import tempfile
+import time
+
+# Routes that take a photo; their request bodies are capped before anything is read
+PHOTO_UPLOAD_ENDPOINTS = {'add_participant', 'edit_participant', 'manage_prizes'}
+# Room for a base64 photo (4/3 of the bytes) plus the other form fields
+MAX_PHOTO_REQUEST_BYTES = MAX_PHOTO_BYTES * 4 // 3 + 64 * 1024
+
+class RaffleRequest(Request):
+    @property
+    def max_content_length(self):
+        # CSV imports and restores stream much larger bodies, so the cap is per route
+        if self.endpoint in PHOTO_UPLOAD_ENDPOINTS:
+            return MAX_PHOTO_REQUEST_BYTES
+        return super().max_content_length
 
 app = Flask(__name__, static_folder='../frontend/dist')
+app.request_class = RaffleRequest
+# orjson when installed, a reused stdlib encoder otherwise
+app.json = FastJSONProvider(app)
 CORS(app)  # Enable CORS for all routes
 
-# Configure upload folders
+# Configure upload folders (the default raffle's photos)
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
-PARTICIPANT_PHOTOS = os.path.join(UPLOAD_FOLDER, 'participants')
-PRIZE_PHOTOS = os.path.join(UPLOAD_FOLDER, 'prizes')
-
-# Create upload directories if they don't exist
-os.makedirs(PARTICIPANT_PHOTOS, exist_ok=True)
-os.makedirs(PRIZE_PHOTOS, exist_ok=True)
 
-# Configure allowed file extensions
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+# Every other raffle/event keeps its database and photos in its own directory here
+EVENTS_FOLDER = os.environ.get('RAFFLE_EVENTS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'events'))
 
 # List of safari animals with their emojis
 SAFARI_ANIMALS = [
@@ -31,50 +54,207 @@ SAFARI_ANIMALS = [
     "🦈", "🐙", "🦀", "🦐", "🦑", "🐚", "🐌", "🐛", "🐜", "🐝", "🦋", "🐞", "🐢"
 ]
 
-# Store settings
-settings = {
-    'auto_prize_selection': True,
-    'allow_multiple_wins': True,
-}
-
-# Initialize database
-db = Database()
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def save_uploaded_file(file, folder):
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        # Add timestamp to filename to avoid conflicts
-        base, ext = os.path.splitext(filename)
-        filename = f"{base}_{random.randint(1000, 9999)}{ext}"
-        filepath = os.path.join(folder, filename)
-        file.save(filepath)
-        return filename
+# Bulk import limits
+IMPORT_BATCH_SIZE = 1000
+# Validated import rows kept in memory before the spool moves to a temp file
+IMPORT_SPOOL_MEMORY = 8 * 1024 * 1024
+MAX_IMPORT_ERRORS = 100
+
+# Resized photo variants are generated in the background
+image_pipeline = ImagePipeline(workers=int(os.environ.get('RAFFLE_IMAGE_WORKERS', 2)))
+
+# Hot photo bytes (e.g. the winner display) are served from memory
+photo_cache_bytes = int(float(os.environ.get('RAFFLE_PHOTO_CACHE_MB', 64)) * 1024 * 1024)
+photo_cache = BytesLRU(photo_cache_bytes) if photo_cache_bytes > 0 else None
+
+# Content-addressed photos never change under the same URL
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Initialize databases; RAFFLE_SLOW_QUERY_MS turns on SQL tracing and the slow-query log
+slow_query_ms = os.environ.get('RAFFLE_SLOW_QUERY_MS')
+raffles = RaffleRegistry(
+    EVENTS_FOLDER, image_pipeline, photo_cache,
+    max_open=int(os.environ.get('RAFFLE_MAX_OPEN_EVENTS', 8)),
+    pool_size=int(os.environ.get('RAFFLE_DB_POOL_SIZE', 5)),
+    idle_timeout=float(os.environ.get('RAFFLE_DB_IDLE_TIMEOUT', 300)),
+    slow_query_ms=float(slow_query_ms) if slow_query_ms else None,
+    compact_interval=float(os.environ.get('RAFFLE_CHANGES_COMPACT_SECONDS', 300))
+)
+# The unscoped /api routes serve raffle.db and uploads/ as before
+raffles.default = raffles.build('default', 'raffle.db', UPLOAD_FOLDER)
+
+def current_raffle():
+    """Raffle of the current request: /api/events/<event_id>/... or the default one."""
+    raffle = g.get('raffle') if has_request_context() else None
+    return raffle or raffles.default
+
+# Per-raffle handles, resolved for each request
+db = LocalProxy(lambda: current_raffle().db)
+participant_photos = LocalProxy(lambda: current_raffle().participant_photos)
+prize_photos = LocalProxy(lambda: current_raffle().prize_photos)
+broadcaster = LocalProxy(lambda: current_raffle().broadcaster)
+
+# Serialized GET bodies keyed by route and query, valid for one data version
+response_cache = VersionedCache(max_entries=256)
+
+# Prometheus metrics served at /api/metrics
+metrics = Registry()
+request_count = metrics.counter(
+    'raffle_http_requests_total', 'HTTP requests by route and status', ('method', 'route', 'status'))
+request_latency = metrics.histogram(
+    'raffle_http_request_duration_seconds', 'HTTP request latency by route and status', ('method', 'route', 'status'))
+draws_count = metrics.counter('raffle_draws_total', 'Winners drawn')
+participants_added_count = metrics.counter('raffle_participants_added_total', 'Participants registered or imported')
+request_queries = metrics.histogram(
+    'raffle_db_queries_per_request', 'SQL statements per request (with SQL tracing on)', ('method', 'route'),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 500, 1000))
+
+# Photos nothing refers to any more are deleted in the background, never in a request
+photo_collector = PhotoCollector(
+    raffles.open_raffles,
+    grace=float(os.environ.get('RAFFLE_PHOTO_GC_GRACE_SECONDS', 600)),
+    interval=float(os.environ.get('RAFFLE_PHOTO_GC_SECONDS', 60))
+)
+photo_collector.start()
+
+@metrics.collector
+def collect_runtime_metrics():
+    # Counters include raffles closed since startup, so they never go down;
+    # gauges cover the raffles open right now
+    totals = raffles.counter_totals()
+    open_raffles = raffles.open_raffles()
+    pools = [raffle.db.pool for raffle in open_raffles]
+    yield ('raffle_photo_bytes_written_total', 'counter', 'Bytes of new photo originals written',
+           totals['photo_bytes_written'])
+    yield ('raffle_photos_collected_total', 'counter', 'Orphaned photo files removed by the photo collector',
+           photo_collector.removed)
+    yield ('raffle_db_pool_waits_total', 'counter', 'Connection checkouts that waited for a free connection',
+           totals['pool_waits'])
+    yield ('raffle_db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a free connection',
+           totals['pool_wait_seconds'])
+    yield ('raffle_db_pool_open_connections', 'gauge', 'Open SQLite connections', sum(pool.open_count for pool in pools))
+    yield ('raffle_sse_subscribers', 'gauge', 'Connected /api/events clients',
+           sum(r.broadcaster.subscriber_count for r in open_raffles))
+    yield ('raffle_open_raffles', 'gauge', 'Raffles with an open database', len(open_raffles))
+    if slow_query_ms:
+        yield ('raffle_db_statements_total', 'counter', 'SQL statements executed', totals['statements'])
+        yield ('raffle_db_slow_queries_total', 'counter', 'SQL statements over the slow-query threshold',
+               totals['slow_queries'])
+
+@app.url_value_preprocessor
+def bind_raffle(endpoint, values):
+    if values and 'event_id' in values:
+        raffle = raffles.get(values.pop('event_id'))
+        if raffle is None:
+            abort(make_response(jsonify({
+                'status': 'error',
+                'message': 'Raffle not found'
+            }), 404))
+        g.raffle = raffle
+        g.raffle_lease = raffle
+
+@app.after_request
+def release_raffle_on_close(response):
+    # Streamed bodies still read the raffle, so the lease ends with the response
+    raffle = g.pop('raffle_lease', None)
+    if raffle is not None:
+        response.call_on_close(lambda: raffles.release(raffle))
+    return response
+
+@app.teardown_request
+def release_raffle(error):
+    # Only reached with the lease still held when no response was produced
+    raffle = g.pop('raffle_lease', None)
+    if raffle is not None:
+        raffles.release(raffle)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if db.tracer is not None:
+        db.tracer.begin_request()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.get('request_start')
+    if start is not None:
+        # Label by URL rule, not path, so ids and filenames don't explode cardinality
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        labels = (request.method, route, str(response.status_code))
+        request_count.inc(*labels)
+        request_latency.observe(time.perf_counter() - start, *labels)
+        if db.tracer is not None:
+            queries = db.tracer.request_query_count()
+            request_queries.observe(queries, request.method, route)
+            response.headers['X-Query-Count'] = str(queries)
+    return response
+
+def versioned_json(cache_key, build):
+    """JSON response cached per database version with a strong ETag.
+
+    Polls that send a matching If-None-Match get a 304 without querying the
+    tables or re-serializing the body.
+    """
+    cache_key = (current_raffle().id, cache_key)
+    version = db.version()
+    cached = response_cache.get(cache_key, version)
+    if cached is None:
+        body = app.json.dumps_bytes(build()) + b'\n'
+        cached = (hashlib.sha1(body).hexdigest(), body)
+        response_cache.put(cache_key, version, cached)
+
+    etag, body = cached
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def wants_stream():
+    return request.args.get('stream', 'false').lower() == 'true'
+
+def streamed_json_array(items):
+    """JSON array response encoded as `items` are read, for lists too large to build in memory."""
+    response = Response(app.json.iter_array(items), mimetype='application/json')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def save_uploaded_file(file, store):
+    # Streamed to disk in chunks. The image type comes from the content, not the
+    # filename; raises ValueError for non-images and oversized files
+    if file:
+        return store.save_upload(file.stream)
     return None
 
-def process_base64_image(base64_string, folder):
+def process_base64_image(base64_string, store):
     try:
         # Remove header if present
         if ',' in base64_string:
-            base64_string = base64_string.split(',')[1]
+            base64_string = base64_string[base64_string.index(',') + 1:]
         
         # Decode base64 string
         img_data = base64.b64decode(base64_string)
-        
-        # Generate random filename
-        filename = f"image_{random.randint(1000, 9999)}.jpg"
-        filepath = os.path.join(folder, filename)
-        
-        # Save the image
-        with open(filepath, 'wb') as f:
-            f.write(img_data)
-            
-        return filename
-    except Exception as e:
-        print(f"Error processing base64 image: {e}")
+    except (ValueError, TypeError):
+        raise ValueError('Photo is not valid base64')
+    # Save the image under its content hash; raises ValueError for non-images
+    return store.save_upload(io.BytesIO(img_data))
+
+def save_participant_photo():
+    """Store the photo sent with an add/edit participant request; returns its URL or None.
+
+    The webcam capture arrives as a binary multipart `photo` file; a base64
+    `photo` form field from older clients is still accepted.
+    """
+    upload = request.files.get('photo')
+    if upload:
+        filename = save_uploaded_file(upload, participant_photos)
+    elif request.form.get('photo', '').startswith(('/', 'http')):
+        # The current photo's URL, sent back unchanged by the edit form
         return None
+    elif request.form.get('photo'):
+        filename = process_base64_image(request.form['photo'], participant_photos)
+    else:
+        return None
+    return current_raffle().photo_url('participants', filename) if filename else None
 
 @app.route('/', defaults={'path': 'index.html'})
 @app.route('/<path:path>')
@@ -83,32 +263,114 @@ def serve_react(path):
         return send_from_directory(app.static_folder, path)
     return send_from_directory('frontend/dist', 'index.html')
 
+def send_photo(store, filename):
+    """Serve the smallest generated variant that fits `?size=thumb|display` or `?w=<px>`.
+
+    WebP is preferred when the client accepts it. Content-addressed photos get
+    a strong ETag and immutable caching, and their bytes go through the
+    in-memory LRU. Falls back to the original while variants are still being
+    generated or for formats OpenCV can't read.
+    """
+    variant = choose_variant(request.args.get('size'), request.args.get('w', type=int))
+    formats = ['webp', 'jpg'] if request.accept_mimetypes['image/webp'] else ['jpg']
+    served, immutable = store.resolve(filename, variant, formats)
+    if served is None:
+        abort(404)
+
+    if not immutable:
+        response = send_from_directory(store.folder, served)
+        if variant:
+            response.headers['Cache-Control'] = 'no-cache'
+            response.vary.add('Accept')
+        return response
+
+    # The served name embeds the content hash, so it doubles as a strong ETag
+    if request.if_none_match.contains(served):
+        response = app.response_class(status=304)
+        data = None
+    else:
+        data = store.read(served)
+        response = app.response_class(data, mimetype=mimetypes.guess_type(served)[0])
+    response.set_etag(served)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    if variant:
+        response.vary.add('Accept')
+    if data is None:
+        return response
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(data))
+
 @app.route('/api/uploads/participants/<path:filename>')
 def serve_participant_photo(filename):
-    return send_from_directory(PARTICIPANT_PHOTOS, filename)
+    return send_photo(participant_photos, filename)
 
 @app.route('/api/uploads/prizes/<path:filename>')
 def serve_prize_photo(filename):
-    return send_from_directory(PRIZE_PHOTOS, filename)
+    return send_photo(prize_photos, filename)
 
 @app.route('/api/settings', methods=['GET', 'POST'])
 def handle_settings():
     if request.method == 'POST':
-        data = request.json
-        db.update_settings(data)
-        settings.update(data)        
+        try:
+            settings = db.update_settings(request.json)
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        broadcaster.publish('settings_updated', settings)
         return jsonify({
             'status': 'success',
             'settings': settings
         })
-    settings.update(db.get_settings())  
-    return jsonify(settings)
+    return versioned_json('settings', db.get_settings)
+
+@app.route('/api/events')
+def stream_events():
+    """Server-sent events stream of compact deltas from every mutating endpoint.
+
+    A `resync` event means the client fell behind and should refetch the
+    full participant and prize lists.
+    """
+    subscription = broadcaster.subscribe()
+    return Response(
+        broadcaster.stream(subscription),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+# Largest batch a single /api/changes poll may ask for
+MAX_CHANGES_LIMIT = 5000
+
+@app.route('/api/changes')
+def get_changes():
+    """Rows changed since a change-log version, for clients polling instead of streaming.
+
+    Pass the returned `version` as `since` on the next call. When `reset` is
+    true the client refetches the full lists and continues from `version`.
+    """
+    try:
+        since = request.args.get('since')
+        since = int(since) if since is not None else None
+        limit = int(request.args.get('limit', 1000))
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': 'since and limit must be integers'
+        }), 400
+    if limit < 1:
+        return jsonify({
+            'status': 'error',
+            'message': 'limit must be positive'
+        }), 400
+    return jsonify(db.get_changes(since, min(limit, MAX_CHANGES_LIMIT)))
 
 @app.route('/api/add_participant', methods=['POST'])
 def add_participant():
     name = request.form.get('name')
     tickets = int(request.form.get('tickets', 1))
-    photo = request.form.get('photo')  # Base64 image from webcam
     
     if not name or tickets < 1:
         return jsonify({
@@ -116,14 +378,18 @@ def add_participant():
             'message': 'Invalid input data'
         }), 400
     
-    photo_path = None
-    if photo:
-        filename = process_base64_image(photo, PARTICIPANT_PHOTOS)
-        if filename:
-            photo_path = f"/api/uploads/participants/{filename}"
+    try:
+        photo_path = save_participant_photo()
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     
     animal = random.choice(SAFARI_ANIMALS)
     participant = db.add_participant(name, tickets, animal, photo_path)
+    participants_added_count.inc()
+    broadcaster.publish('participant_added', participant)
     
     return jsonify({
         'status': 'success',
@@ -131,13 +397,138 @@ def add_participant():
         'participant': participant
     })
 
+def parse_import_rows(stream, fmt):
+    """Yield (row_number, record, error) for each row of a CSV or NDJSON stream."""
+    if isinstance(stream, io.RawIOBase):
+        stream = io.BufferedReader(stream)
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+
+    for row_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, None, f'Invalid JSON: {e.msg}'
+            continue
+        if not isinstance(record, dict):
+            yield row_number, None, 'Expected a JSON object'
+            continue
+        yield row_number, record, None
+
+def validate_import_rows(rows, errors):
+    """Turn parsed rows into participant tuples, collecting per-row errors."""
+    for row_number, record, error in rows:
+        if error is None:
+            name = str(record.get('name') or '').strip()
+            try:
+                tickets = int(record.get('tickets') or 1)
+            except (TypeError, ValueError):
+                tickets = 0
+            if not name:
+                error = 'Name is required'
+            elif tickets < 1:
+                error = 'Invalid ticket count'
+
+        if error is not None:
+            errors['failed'] += 1
+            if len(errors['rows']) < MAX_IMPORT_ERRORS:
+                errors['rows'].append({'row': row_number, 'message': error})
+            continue
+
+        yield name, tickets, random.choice(SAFARI_ANIMALS), None
+
+def spool_import_rows(rows):
+    """Read every row into a spool file and return an iterator over it.
+
+    The upload is parsed and validated before the database write lock is
+    taken, so a slow client holds the lock for the inserts only, not for the
+    whole transfer. Small imports stay in memory; larger ones go to disk.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MEMORY, mode='w+', encoding='utf-8')
+    try:
+        for row in rows:
+            spool.write(json.dumps(row, ensure_ascii=False))
+            spool.write('\n')
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+
+    def read():
+        with spool:
+            for line in spool:
+                yield tuple(json.loads(line))
+    return read()
+
+@app.route('/api/metrics')
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/import_participants', methods=['POST'])
+def import_participants():
+    """Bulk-register participants from a CSV (name,tickets) or NDJSON upload.
+
+    Accepts a multipart `file` field or a raw request body. The format comes
+    from `?format=csv|ndjson`, else the file extension or content type. The
+    import is all or nothing: a file that cannot be read saves no rows.
+    """
+    upload = request.files.get('file')
+    if upload:
+        stream, filename, mimetype = upload.stream, upload.filename or '', upload.mimetype
+    else:
+        stream, filename, mimetype = request.stream, '', request.mimetype
+
+    fmt = request.args.get('format')
+    if not fmt:
+        is_ndjson = filename.lower().endswith(('.ndjson', '.jsonl')) or mimetype in ('application/x-ndjson', 'application/jsonl')
+        fmt = 'ndjson' if is_ndjson else 'csv'
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({
+            'status': 'error',
+            'message': 'Unsupported import format'
+        }), 400
+
+    errors = {'failed': 0, 'rows': []}
+    start = time.perf_counter()
+    try:
+        rows = spool_import_rows(validate_import_rows(parse_import_rows(stream, fmt), errors))
+    except (UnicodeDecodeError, csv.Error) as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Could not read import file, nothing was imported: {e}',
+            'imported': 0
+        }), 400
+    imported = db.add_participants(rows, batch_size=IMPORT_BATCH_SIZE)
+    elapsed = time.perf_counter() - start
+    if imported:
+        participants_added_count.inc(amount=imported)
+        # Too large to ship as a delta; subscribers refetch the roster
+        broadcaster.publish('participants_imported', {'count': imported})
+
+    return jsonify({
+        'status': 'success',
+        'message': f'Imported {imported} participants',
+        'imported': imported,
+        'failed': errors['failed'],
+        'errors': errors['rows'],
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_second': round(imported / elapsed) if elapsed > 0 else None
+    })
+
 @app.route('/api/edit_participant', methods=['POST'])
 def edit_participant():
     participant_id = int(request.form.get('id'))
     name = request.form.get('name')
     tickets = request.form.get('tickets')
-    photo = request.form.get('photo')  # Base64 image from webcam
-    existingParticipant = db.get_participant(participant_id)
+    # An existing photo URL in the field means the photo is unchanged
+    has_photo = 'photo' in request.files or bool(request.form.get('photo'))
     
     if not participant_id or not name:
         return jsonify({
@@ -145,6 +536,14 @@ def edit_participant():
             'message': 'Invalid input data'
         }), 400
     
+    try:
+        photo_path = save_participant_photo()
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
     try:
         update_data = {'name': name}
         
@@ -157,21 +556,15 @@ def edit_participant():
                 }), 400
             update_data['tickets'] = tickets
         
-        if photo:
-            filename = process_base64_image(photo, PARTICIPANT_PHOTOS)
-            if filename:
-                update_data['photo_path'] = f"/api/uploads/participants/{filename}"
+        if has_photo:
+            if photo_path:
+                update_data['photo_path'] = photo_path
         else:
             # If no photo is provided, ensure photo_path is not set
             update_data['photo_path'] = ""
-        if existingParticipant and existingParticipant.get('photo_path'):
-            # If the participant had a photo, we should remove it if it's being updated
-            filename = os.path.basename(existingParticipant['photo_path'])
-            photo_path = os.path.join(PARTICIPANT_PHOTOS, filename)
-            if os.path.exists(photo_path):
-                os.remove(photo_path)
-            
+        # A replaced photo is removed by the photo collector once nothing refers to it
         participant = db.update_participant(participant_id, **update_data)
+        broadcaster.publish('participant_updated', participant)
         return jsonify({
             'status': 'success',
             'message': 'Updated participant successfully',
@@ -189,17 +582,8 @@ def delete_participant():
     participant_id = int(data.get('id'))
     
     try:
-        # Get participant to find photo path
-        participant = db.get_participant(participant_id)
-        if participant and participant.get('photo_path'):
-            # Extract filename from path
-            filename = os.path.basename(participant['photo_path'])
-            photo_path = os.path.join(PARTICIPANT_PHOTOS, filename)
-            # Delete photo file if it exists
-            if os.path.exists(photo_path):
-                os.remove(photo_path)
-        
         db.delete_participant(participant_id)
+        broadcaster.publish('participant_deleted', {'id': str(participant_id)})
         return jsonify({
             'status': 'success',
             'message': 'Participant deleted successfully'
@@ -218,6 +602,10 @@ def remove_prize():
     
     try:
         db.remove_prize(participant_id, prize_index)
+        broadcaster.publish('prize_unassigned', {
+            'participant_id': str(participant_id),
+            'prize_index': prize_index
+        })
         return jsonify({
             'status': 'success',
             'message': 'Prize removed successfully'
@@ -231,7 +619,9 @@ def remove_prize():
 @app.route('/api/prizes', methods=['GET', 'POST', 'DELETE', 'PUT'])
 def manage_prizes():
     if request.method == 'GET':
-        return jsonify(db.get_prizes())
+        if wants_stream():
+            return streamed_json_array(db.iter_prizes())
+        return versioned_json('prizes', db.get_prizes)
         
     elif request.method == 'POST':
         name = request.form.get('name')
@@ -248,11 +638,12 @@ def manage_prizes():
         try:
             photo_path = None
             if photo:
-                filename = save_uploaded_file(photo, PRIZE_PHOTOS)
+                filename = save_uploaded_file(photo, prize_photos)
                 if filename:
-                    photo_path = f"/api/uploads/prizes/{filename}"
+                    photo_path = current_raffle().photo_url('prizes', filename)
             
             prize = db.add_prize_to_pool(name, description, photo_path, quantity)
+            broadcaster.publish('prize_added', prize)
             return jsonify({
                 'status': 'success',
                 'message': 'Prize added successfully',
@@ -281,11 +672,12 @@ def manage_prizes():
                 update_data['quantity'] = int(quantity)
             
             if photo:
-                filename = save_uploaded_file(photo, PRIZE_PHOTOS)
+                filename = save_uploaded_file(photo, prize_photos)
                 if filename:
-                    update_data['photo_path'] = f"/api/uploads/prizes/{filename}"
+                    update_data['photo_path'] = current_raffle().photo_url('prizes', filename)
             
             prize = db.update_prize(prize_id, **update_data)
+            broadcaster.publish('prize_updated', prize)
             return jsonify({
                 'status': 'success',
                 'message': 'Prize updated successfully',
@@ -302,18 +694,8 @@ def manage_prizes():
         prize_id = int(data.get('prize_id'))
         
         try:
-            # Get prize to find photo path
-            prizes = db.get_prizes()
-            prize = next((p for p in prizes if int(p['id']) == prize_id), None)
-            if prize and prize.get('photo_path'):
-                # Extract filename from path
-                filename = os.path.basename(prize['photo_path'])
-                photo_path = os.path.join(PRIZE_PHOTOS, filename)
-                # Delete photo file if it exists
-                if os.path.exists(photo_path):
-                    os.remove(photo_path)
-            
             db.remove_prize_from_pool(prize_id)
+            broadcaster.publish('prize_deleted', {'id': str(prize_id)})
             return jsonify({
                 'status': 'success',
                 'message': 'Prize removed successfully'
@@ -326,83 +708,29 @@ def manage_prizes():
 
 @app.route('/api/pick_winner', methods=['POST'])
 def pick_winner():
-    participants = db.get_participants()
-    if not participants:
-        return jsonify({
-            'status': 'error',
-            'message': 'No participants in the raffle'
-        }), 400
-    
     data = request.json
     prize_id = int(data.get('prize_id')) if data.get('prize_id') else None
     auto_select = data.get('auto_select', False)
-    settings = db.get_settings()
     
-    # If auto prize selection is enabled or explicitly requested
-    if auto_select:
-        # Get available prizes with remaining quantity
-        available_prizes = [p for p in db.get_prizes() if p['remaining'] > 0]
-        if not available_prizes:
-            return jsonify({
-                'status': 'error',
-                'message': 'No prizes available'
-            }), 400
-        # Randomly select a prize
-        selected_prize = random.choice(available_prizes)
-        prize_id = int(selected_prize['id'])
-    elif not prize_id:
+    if not auto_select and not prize_id:
         return jsonify({
             'status': 'error',
             'message': 'Prize ID is required when auto selection is disabled'
         }), 400
     
-    # Filter out participants who have won maximum prizes
-    eligible_participants = []
-    for participant in participants:
-        if settings.get('allow_multiple_wins', False):
-            # Can win up to their ticket count
-            if len(participant['prizes']) < participant['tickets']:
-                eligible_participants.append(participant)
-        else:
-            # Can only win once
-            if len(participant['prizes']) == 0:
-                eligible_participants.append(participant)
-    
-    if not eligible_participants:
-        return jsonify({
-            'status': 'error',
-            'message': 'No eligible participants for this draw'
-        }), 400
-    
-    weighted_participants = []
-    if not settings.get('allow_multiple_wins', False):
-        # Weight participants by their remaining tickets
-        for participant in eligible_participants:
-            remaining_tickets = participant['tickets'] - len(participant['prizes'])
-            weighted_participants.extend([participant] * remaining_tickets)
-    else:
-        weighted_participants = eligible_participants
- 
-    print(f"Weighted participants: {len(weighted_participants)}")
-    winner = random.choice(weighted_participants)
-    
     try:
-        # Add prize to winner
-        db.add_prize(int(winner['id']), prize_id)
-        
-        # Get updated winner data and prize details
-        updated_winner = db.get_participant(int(winner['id']))
-        prizes = db.get_prizes()
-        won_prize = next((p for p in prizes if int(p['id']) == prize_id), None)
-        
+        # Eligibility, selection, limit checks and the insert run in one transaction
+        result = db.draw_winner(None if auto_select else prize_id)
+        draws_count.inc()
+        broadcaster.publish('winner_drawn', result)
         return jsonify({
             'status': 'success',
-            'winner': winner['name'],
-            'tickets': winner['tickets'],
-            'animal': winner['animal'],
-            'photo': winner.get('photo_path'),
-            'prize': won_prize['name'] if won_prize else None,
-            'prize_photo': won_prize.get('photo_path') if won_prize else None
+            'winner': result['winner'],
+            'tickets': result['tickets'],
+            'animal': result['animal'],
+            'photo': result['photo'],
+            'prize': result['prize'],
+            'prize_photo': result['prize_photo']
         })
     except ValueError as e:
         return jsonify({
@@ -410,9 +738,37 @@ def pick_winner():
             'message': str(e)
         }), 400
 
+@app.route('/api/pick_winners', methods=['POST'])
+def pick_winners():
+    """Draw winners for many prizes in one transaction.
+
+    Body: {"prizes": [{"prize_id": 1, "quantity": 2}, ...]} or {"prizes": "all"}
+    to draw every remaining prize unit.
+    """
+    data = request.json or {}
+    requested = data.get('prizes', 'all')
+
+    try:
+        result = db.draw_winners(None if requested == 'all' else requested)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    draws_count.inc(amount=len(result['winners']))
+    broadcaster.publish('winners_drawn', result)
+    return jsonify({
+        'status': 'success',
+        'message': f"Drew {len(result['winners'])} winners",
+        'winners': result['winners'],
+        'unfilled': result['unfilled']
+    })
+
 @app.route('/api/clear_prizes', methods=['POST'])
 def clear_prizes():
     db.clear_prizes()
+    broadcaster.publish('prizes_cleared')
     return jsonify({
         'status': 'success',
         'message': 'All prizes cleared'
@@ -420,32 +776,151 @@ def clear_prizes():
 
 @app.route('/api/clear_all_data', methods=['POST'])
 def clear_all_data():
-    # Delete all photos
-    for file in os.listdir(PARTICIPANT_PHOTOS):
-        os.remove(os.path.join(PARTICIPANT_PHOTOS, file))
-    for file in os.listdir(PRIZE_PHOTOS):
-        os.remove(os.path.join(PRIZE_PHOTOS, file))
-        
+    # The photos are left to the photo collector
     db.clear_all_data()
+    broadcaster.publish('data_cleared')
     return jsonify({
         'status': 'success',
         'message': 'All data cleared'
     })
 
+@app.route('/api/backup')
+def download_backup():
+    """Online copy of the raffle database, taken while the raffle keeps running."""
+    folder = os.path.dirname(os.path.abspath(db.db_path))
+    fd, path = tempfile.mkstemp(dir=folder, suffix='.db')
+    os.close(fd)
+    try:
+        backup.backup_database(db.db_path, path)
+        f = open(path, 'rb')
+    finally:
+        # The open handle keeps the data readable until the response is sent
+        os.remove(path)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    return send_file(f, mimetype='application/vnd.sqlite3', as_attachment=True,
+                     download_name=f'{current_raffle().id}-{stamp}.db')
+
+@app.route('/api/export')
+def export_snapshot():
+    """Streamed snapshot: ?format=ndjson for rows only, otherwise a tarball with the photos."""
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    if request.args.get('format') == 'ndjson':
+        body, mimetype, ext = backup.iter_ndjson(db.db_path), 'application/x-ndjson', 'ndjson'
+    else:
+        body, mimetype, ext = backup.iter_tar(db.db_path, current_raffle().upload_folder), 'application/x-tar', 'tar'
+    return Response(body, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={current_raffle().id}-{stamp}.{ext}'
+    })
+
+@app.route('/api/restore', methods=['POST'])
+def restore_snapshot():
+    """Replace all data with an /api/export body (?format=ndjson for NDJSON, tar otherwise)."""
+    fmt = request.args.get('format', 'tar')
+    try:
+        result = backup.restore(db, request.stream, fmt, current_raffle().upload_folder)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    broadcaster.publish('data_cleared')
+    return jsonify({
+        'status': 'success',
+        'restored': result['rows']
+    })
+
+@app.errorhandler(PoolTimeout)
+def database_busy(error):
+    return jsonify({
+        'status': 'error',
+        'message': 'The database is busy, please try again'
+    }), 503
+
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({
+        'status': 'error',
+        'message': f'Upload is larger than {MAX_PHOTO_BYTES // (1024 * 1024)} MB'
+    }), 413
+
 @app.route('/api/get_participants', methods=['GET'])
 def get_participants():
-    """Endpoint to get all participants"""  
-    participants = db.get_participants()
-    # Sort participants: those with remaining wins/tickets first
-    def has_remaining_wins(p):
-        if settings.get('allow_multiple_wins', False):
-            return (p['tickets'] - len(p['prizes'])) > 0
-        else:
-            return len(p['prizes']) == 0
+    """Endpoint to get participants.
 
-    participants = sorted(participants, key=has_remaining_wins, reverse=True)
+    With `limit`, `after` or a filter (`eligible`, `has_won`, `name`) the response
+    is a keyset-paginated page: {"participants": [...], "next_cursor": ...}.
+    Without them the full sorted list is returned as before; `stream=true`
+    sends the same list encoded straight off a database cursor.
+    """
+    paginated_args = ('limit', 'after', 'eligible', 'has_won', 'name')
+    if any(arg in request.args for arg in paginated_args):
+        try:
+            limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+            has_won = request.args.get('has_won')
+            page_args = {
+                'limit': limit,
+                'after': request.args.get('after'),
+                'eligible_only': request.args.get('eligible', 'false').lower() == 'true',
+                'has_won': None if has_won is None else has_won.lower() == 'true',
+                'name_prefix': request.args.get('name')
+            }
+            return versioned_json(
+                ('participants_page',) + tuple(sorted(page_args.items())),
+                lambda: db.get_participants_page(**page_args)
+            )
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+
+    if wants_stream():
+        return streamed_json_array(db.iter_participants())
+
+    def build():
+        participants = db.get_participants()
+        allow_multiple_wins = db.settings().allow_multiple_wins
+        # Sort participants: those with remaining wins/tickets first
+        def has_remaining_wins(p):
+            if allow_multiple_wins:
+                return (p['tickets'] - len(p['prizes'])) > 0
+            else:
+                return len(p['prizes']) == 0
+
+        return sorted(participants, key=has_remaining_wins, reverse=True)
+
+    return versioned_json('participants', build)
+
+@app.route('/api/raffles', methods=['GET', 'POST'])
+def manage_raffles():
+    """List events, or create one whose routes live under /api/events/<id>/."""
+    if request.method == 'GET':
+        return jsonify(raffles.list())
+
+    data = request.json or {}
+    try:
+        raffle = raffles.create(data.get('id'), data.get('name'))
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    return jsonify({
+        'status': 'success',
+        'raffle': raffle
+    })
 
-    return jsonify(participants)
+# Every per-raffle route is also served for a specific event, e.g.
+# /api/prizes -> /api/events/<event_id>/prizes and /api/events -> /api/events/<event_id>/events
+GLOBAL_ROUTES = {'/api/metrics', '/api/raffles'}
+for rule in list(app.url_map.iter_rules()):
+    if rule.rule.startswith('/api/') and rule.rule not in GLOBAL_ROUTES:
+        app.add_url_rule(
+            '/api/events/<event_id>' + rule.rule[len('/api'):],
+            endpoint=rule.endpoint,
+            view_func=app.view_functions[rule.endpoint],
+            methods=rule.methods
+        )
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,311 @@
+"""Online backup, streaming export and restore of a raffle database.
+
+    python backup.py backup raffle.db backups/raffle.db
+    python backup.py export raffle.db snapshot.tar --uploads uploads
+    python backup.py restore raffle.db snapshot.tar --uploads uploads
+
+Exports ending in .ndjson hold the database rows only; tarballs also carry the
+participant and prize photos.
+"""
+import argparse
+import io
+import json
+import os
+import sqlite3
+import tarfile
+import tempfile
+import time
+from typing import IO, Any, Dict, Iterator, Optional
+
+# Pages copied per backup step; other connections get the GIL and the disk in between
+BACKUP_PAGES = 1024
+BACKUP_SLEEP = 0.005
+
+# Tables in restore order with the columns to carry over. participant_prizes
+# goes first so its counter triggers find no rows to update; the counters are
+# then loaded as exported, which is far cheaper than rebuilding them row by row.
+EXPORT_TABLES = {
+    'participant_prizes': ('id', 'participant_id', 'prize_id', 'created_at'),
+    'participants': ('id', 'name', 'tickets', 'animal', 'photo_path', 'prize_count', 'created_at'),
+    'prizes': ('id', 'name', 'description', 'photo_path', 'quantity', 'assigned_count', 'created_at'),
+    'settings': ('key', 'value'),
+}
+EXPORT_FORMAT = 1
+PHOTO_KINDS = ('participants', 'prizes')
+
+# Rows fetched per export batch and inserted per restore executemany
+BATCH_ROWS = 10000
+# NDJSON bytes per tar member, which is what a streamed tarball has to buffer
+MEMBER_BYTES = 4 * 1024 * 1024
+
+def backup_database(db_path: str, target: str, pages: int = BACKUP_PAGES,
+                    sleep: float = BACKUP_SLEEP) -> Dict[str, Any]:
+    """Copy a live database to `target` with SQLite's online backup API.
+
+    The copy runs `pages` pages at a time inside one read transaction, so it
+    is a consistent snapshot and, with the WAL journal, writers carry on
+    between steps instead of forcing the backup to restart. `target` is only
+    replaced once the copy is complete.
+    """
+    folder = os.path.dirname(os.path.abspath(target))
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.backup')
+    os.close(fd)
+    steps = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+
+    start = time.perf_counter()
+    source = sqlite3.connect(db_path)
+    dest = sqlite3.connect(tmp_path)
+    try:
+        source.execute('BEGIN')
+        source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        source.backup(dest, pages=pages, progress=progress, sleep=sleep)
+        source.rollback()
+    except Exception:
+        dest.close()
+        os.remove(tmp_path)
+        raise
+    finally:
+        source.close()
+    dest.close()
+    os.replace(tmp_path, target)
+    return {
+        'path': target,
+        'bytes': os.path.getsize(target),
+        'steps': steps,
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+
+# json.dumps builds a new encoder per call when given options
+_encode = json.JSONEncoder(separators=(',', ':')).encode
+
+def _line(obj: Any) -> bytes:
+    return (_encode(obj) + '\n').encode()
+
+def iter_ndjson(db_path: str) -> Iterator[bytes]:
+    """Stream a consistent snapshot as NDJSON.
+
+    A header line comes first, then for each table a {"table", "columns"} line
+    followed by one JSON array per row. Chunks always end on a line boundary.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        # One read transaction keeps every table at the same snapshot
+        conn.execute('BEGIN')
+        yield _line({'format': 'raffle-export', 'version': EXPORT_FORMAT})
+        for table, columns in EXPORT_TABLES.items():
+            yield _line({'table': table, 'columns': columns})
+            cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY rowid")
+            while True:
+                rows = cursor.fetchmany(BATCH_ROWS)
+                if not rows:
+                    break
+                yield ('\n'.join(map(_encode, rows)) + '\n').encode()
+    finally:
+        conn.close()
+
+class _StreamBuffer:
+    """Write-only file object that collects what tarfile writes until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def _add_bytes(tar: tarfile.TarFile, name: str, data: bytes):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    tar.addfile(info, io.BytesIO(data))
+
+def iter_tar(db_path: str, upload_folder: Optional[str]) -> Iterator[bytes]:
+    """Stream an uncompressed tarball of the NDJSON snapshot plus the uploaded photos.
+
+    The NDJSON is split into data/NNNNN.ndjson members of about MEMBER_BYTES,
+    since tar needs each member's size up front. Photos go under
+    uploads/<kind>/; ones deleted while the export runs are skipped.
+    """
+    out = _StreamBuffer()
+    with tarfile.open(fileobj=out, mode='w|') as tar:
+        part = []
+        size = 0
+        index = 0
+        for chunk in iter_ndjson(db_path):
+            part.append(chunk)
+            size += len(chunk)
+            if size >= MEMBER_BYTES:
+                _add_bytes(tar, f'data/{index:05d}.ndjson', b''.join(part))
+                part, size, index = [], 0, index + 1
+                yield out.drain()
+        if part:
+            _add_bytes(tar, f'data/{index:05d}.ndjson', b''.join(part))
+
+        for kind in PHOTO_KINDS if upload_folder else ():
+            folder = os.path.join(upload_folder, kind)
+            if not os.path.isdir(folder):
+                continue
+            for name in sorted(os.listdir(folder)):
+                path = os.path.join(folder, name)
+                # Skip uploads still being written
+                if name.endswith('.upload') or not os.path.isfile(path):
+                    continue
+                try:
+                    tar.add(path, arcname=f'uploads/{kind}/{name}')
+                except FileNotFoundError:
+                    continue
+                yield out.drain()
+    yield out.drain()
+
+def _iter_tar_lines(source: IO[bytes], upload_folder: Optional[str]) -> Iterator[bytes]:
+    """NDJSON lines from an export tarball, writing its photos into `upload_folder` on the way."""
+    with tarfile.open(fileobj=source, mode='r|*') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            parts = member.name.split('/')
+            if len(parts) == 2 and parts[0] == 'data' and parts[1].endswith('.ndjson'):
+                yield from tar.extractfile(member)
+            elif len(parts) == 3 and parts[0] == 'uploads' and parts[1] in PHOTO_KINDS:
+                name = parts[2]
+                if upload_folder is None or not name or name.startswith('.'):
+                    continue
+                folder = os.path.join(upload_folder, parts[1])
+                os.makedirs(folder, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.upload')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(tar.extractfile(member).read())
+                os.replace(tmp_path, os.path.join(folder, name))
+
+def restore(db, source: IO[bytes], fmt: str = 'tar', upload_folder: Optional[str] = None) -> Dict[str, Any]:
+    """Replace a Database's contents with an export read from `source`.
+
+    Everything is loaded in a single transaction with one executemany per
+    BATCH_ROWS rows, so readers see either the old data or the restored data.
+    Row lines are decoded a batch at a time with a single json.loads.
+    Tarball photos are written to `upload_folder` as they are read. Synced
+    clients are sent back to a full refetch, as after clear_all_data.
+    """
+    if fmt not in ('tar', 'ndjson'):
+        raise ValueError('Restore format must be tar or ndjson')
+    lines = _iter_tar_lines(source, upload_folder) if fmt == 'tar' else iter(source)
+    start = time.perf_counter()
+    counts = {table: 0 for table in EXPORT_TABLES}
+
+    with db.get_db() as conn:
+        cursor = conn.cursor()
+        try:
+            header = json.loads(next(lines, b'null'))
+            if not isinstance(header, dict) or header.get('format') != 'raffle-export':
+                raise ValueError('Not a raffle export')
+            if header.get('version') != EXPORT_FORMAT:
+                raise ValueError(f"Unsupported export version {header.get('version')}")
+
+            cursor.execute('BEGIN IMMEDIATE')
+            # Reverse order, so deleting participant_prizes last updates no counters
+            for table in reversed(list(EXPORT_TABLES)):
+                cursor.execute(f'DELETE FROM {table}')
+
+            table = insert = None
+            batch = []
+
+            def flush():
+                rows = json.loads(b'[' + b','.join(batch) + b']')
+                cursor.executemany(insert, rows)
+                counts[table] += len(rows)
+                batch.clear()
+
+            for line in lines:
+                if line.startswith(b'['):
+                    if insert is None:
+                        raise ValueError('Row before any table header')
+                    batch.append(line)
+                    if len(batch) >= BATCH_ROWS:
+                        flush()
+                    continue
+                if not line.strip():
+                    continue
+
+                if batch:
+                    flush()
+                item = json.loads(line)
+                if not isinstance(item, dict):
+                    raise ValueError('Expected a table header')
+                table = item.get('table')
+                columns = item.get('columns') or []
+                # Table and column names end up in SQL, so only known ones pass
+                if table not in EXPORT_TABLES or not set(columns) <= set(EXPORT_TABLES[table]):
+                    raise ValueError(f'Unknown table or columns in export: {table}')
+                insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            if batch:
+                flush()
+
+            # Same as clear_all_data: every synced client starts over
+            cursor.execute('SELECT COALESCE(MAX(version), 0) FROM changes')
+            version = cursor.fetchone()[0]
+            cursor.execute('DELETE FROM changes WHERE version < ?', (version,))
+            cursor.execute('UPDATE change_log SET compacted_through = ? WHERE id = 1', (version,))
+            conn.commit()
+        except (json.JSONDecodeError, sqlite3.IntegrityError, sqlite3.ProgrammingError,
+                tarfile.TarError, TypeError) as e:
+            conn.rollback()
+            raise ValueError(f'Invalid export: {e}')
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            db.bump_version()
+
+    return {
+        'rows': counts,
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    backup_cmd = commands.add_parser('backup', help='online copy of a live database file')
+    backup_cmd.add_argument('database')
+    backup_cmd.add_argument('target')
+    backup_cmd.add_argument('--pages', type=int, default=BACKUP_PAGES, help='pages copied per step')
+    for name, help in (('export', 'write an NDJSON or tar snapshot'), ('restore', 'load a snapshot, replacing all data')):
+        command = commands.add_parser(name, help=help)
+        command.add_argument('database')
+        command.add_argument('file', help='*.ndjson for rows only, anything else for a tarball')
+        command.add_argument('--uploads', help='upload folder holding participants/ and prizes/')
+    args = parser.parse_args()
+
+    if args.command == 'backup':
+        print(json.dumps(backup_database(args.database, args.target, args.pages)))
+        return
+
+    fmt = 'ndjson' if args.file.endswith('.ndjson') else 'tar'
+    if args.command == 'export':
+        start = time.perf_counter()
+        with open(args.file, 'wb') as f:
+            for chunk in iter_ndjson(args.database) if fmt == 'ndjson' else iter_tar(args.database, args.uploads):
+                f.write(chunk)
+        print(json.dumps({'path': args.file, 'bytes': os.path.getsize(args.file),
+                          'seconds': round(time.perf_counter() - start, 3)}))
+    else:
+        from database import Database
+
+        db = Database(args.database)
+        try:
+            with open(args.file, 'rb') as f:
+                print(json.dumps(restore(db, f, fmt, args.uploads)))
+        finally:
+            db.close()
+
+if __name__ == '__main__':
+    main()
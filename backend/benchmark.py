@@ -0,0 +1,980 @@
+"""Benchmark suite for Database and the Flask API.
+
+Seeds synthetic events of the requested sizes in a throwaway directory, times
+every Database method and every /api/* route through Flask's test client, and
+writes machine-readable JSON. With --baseline, results are compared against a
+previous run and the exit status is non-zero when anything regressed past
+--threshold, so slowdowns in the draw path get caught:
+
+    python benchmark.py --sizes 1000,100000 --output bench.json
+    python benchmark.py --sizes 1000,100000 --baseline bench.json
+    python benchmark.py --sizes 1000000 --repeat 3
+
+Extra scenarios run on request:
+
+    python benchmark.py --draw-participants 100000   # draw engine vs list expansion
+    python benchmark.py --sql-draw 500000            # SQL draw vs roster in Python
+    python benchmark.py --stress-processes 8         # concurrent draws from many processes
+    python benchmark.py --draw-distribution 50000    # winner frequencies match the draw rules
+    python benchmark.py --draw-queries 100000        # draw_winner statement count stays constant
+    python benchmark.py --import-rows 100000         # bulk CSV import
+    python benchmark.py --photos 50                  # photo variant payload bytes
+    python benchmark.py --subscribers 500            # SSE fan-out
+    python benchmark.py --backup-rows 1000000        # online backup, export and restore
+    python benchmark.py --uploads 200                # peak RSS of concurrent photo registrations
+    python benchmark.py --simulate 1000              # Monte Carlo draws vs replaying draw_winner
+    python benchmark.py --roster 1000000             # compact draw roster vs participant dicts
+    python benchmark.py --json-rows 200000           # stdlib vs orjson vs streamed list responses
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def seed(db, participants: int):
+    """Synthetic event: `participants` people, one prize per 1000 of them, about half already drawn."""
+    prizes = max(10, participants // 1000)
+    assignments = participants // 2
+    with db.get_db() as conn:
+        conn.execute('BEGIN')
+        conn.executemany(
+            'INSERT INTO participants (name, tickets, animal) VALUES (?, ?, ?)',
+            ((f'Participant {i}', random.randint(1, 5), '🦁') for i in range(participants))
+        )
+        # Leave plenty of quantity so the draw benchmarks never run dry
+        conn.executemany(
+            'INSERT INTO prizes (name, description, quantity) VALUES (?, ?, ?)',
+            ((f'Prize {i}', f'Description {i}', assignments // prizes + 10_000) for i in range(prizes))
+        )
+        conn.executemany(
+            'INSERT INTO participant_prizes (participant_id, prize_id) VALUES (?, ?)',
+            ((i * 2 + 1, i % prizes + 1) for i in range(assignments))
+        )
+        conn.commit()
+    db.bump_version()
+    return prizes
+
+
+def timed(fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'median_ms': round(statistics.median(samples), 4),
+        'min_ms': round(min(samples), 4),
+        'max_ms': round(max(samples), 4),
+        'runs': repeat,
+    }
+
+
+class Ids:
+    """Hands out ids for destructive benchmarks so every run touches a fresh row."""
+
+    def __init__(self, start: int):
+        self.next = start
+
+    def take(self) -> int:
+        value = self.next
+        self.next += 2
+        return value
+
+
+def bench_database(db, participants: int, prizes: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    # Reads bypass the read-model cache so the SQL path is what gets timed
+    cold = db.bump_version
+    heavy = max(1, min(repeat, 3)) if participants >= 100_000 else repeat
+    mid = participants // 2 + 1
+    winners = Ids(1)        # odd ids were seeded with one prize each
+    fresh = Ids(2)          # even ids start without prizes
+    results = {}
+
+    results['get_participants'] = timed(db.get_participants, heavy, cold)
+    results['get_participants (cached)'] = timed(db.get_participants, repeat)
+    results['get_participants_page'] = timed(lambda: db.get_participants_page(limit=100), repeat, cold)
+    results['get_participants_page (filtered)'] = timed(
+        lambda: db.get_participants_page(limit=100, eligible_only=True, name_prefix='Participant 1'), repeat, cold)
+    results['get_participant'] = timed(lambda: db.get_participant(mid), repeat, cold)
+    results['get_prizes'] = timed(db.get_prizes, heavy, cold)
+    results['get_settings'] = timed(db.get_settings, repeat, cold)
+    results['update_settings'] = timed(lambda: db.update_settings({'allow_multiple_wins': True}), repeat)
+    results['add_prize_to_pool'] = timed(lambda: db.add_prize_to_pool('Bench prize', 'Bench', None, 5), repeat)
+    results['update_prize'] = timed(lambda: db.update_prize(1, description='Updated'), repeat)
+    results['remove_prize_from_pool'] = timed(
+        lambda: db.remove_prize_from_pool(db.add_prize_to_pool('Disposable', None, None, 1)['id']), repeat)
+    results['add_participant'] = timed(lambda: db.add_participant('Bench participant', 3, '🦁'), repeat)
+    results['add_participants (1000 rows)'] = timed(
+        lambda: db.add_participants((f'Batch {i}', 1, '🦁', None) for i in range(1000)), repeat)
+    results['update_participant'] = timed(lambda: db.update_participant(mid, name='Renamed', tickets=5), repeat)
+    results['add_prize'] = timed(lambda: db.add_prize(fresh.take(), 1), repeat)
+    results['remove_prize'] = timed(lambda: db.remove_prize(winners.take(), 0), repeat)
+    results['delete_participant'] = timed(lambda: db.delete_participant(winners.take()), repeat)
+    results['draw_winner'] = timed(lambda: db.draw_winner(1), heavy)
+    results['draw_winner (auto)'] = timed(lambda: db.draw_winner(), heavy)
+    results['draw_winners (10 units)'] = timed(lambda: db.draw_winners([{'prize_id': 2, 'quantity': 10}]), heavy)
+    results['check_counters'] = timed(db.check_counters, heavy)
+    return results
+
+
+def bench_routes(raffle_app, participants: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    client = raffle_app.app.test_client()
+    db = raffle_app.db
+    heavy = max(1, min(repeat, 3)) if participants >= 100_000 else repeat
+    winners = Ids(participants // 2 + 1 if (participants // 2) % 2 == 0 else participants // 2)
+    results = {}
+
+    def call(method: str, path: str, expect: int = 200, **kwargs):
+        def run():
+            response = client.open(path, method=method, **kwargs)
+            assert response.status_code == expect, (path, response.status_code, response.data[:200])
+        return run
+
+    def route(name: str, fn, runs: int = repeat, cold: bool = False):
+        results[name] = timed(fn, runs, db.bump_version if cold else None)
+
+    route('GET /api/get_participants', call('GET', '/api/get_participants'), heavy, cold=True)
+    etag = client.get('/api/get_participants').headers['ETag']
+    route('GET /api/get_participants (304)',
+          call('GET', '/api/get_participants', 304, headers={'If-None-Match': etag}))
+    route('GET /api/get_participants?limit=100', call('GET', '/api/get_participants?limit=100'), cold=True)
+    route('GET /api/prizes', call('GET', '/api/prizes'), heavy, cold=True)
+    route('GET /api/settings', call('GET', '/api/settings'), cold=True)
+    route('POST /api/settings', call('POST', '/api/settings', json={'allow_multiple_wins': True}))
+    route('POST /api/add_participant', call('POST', '/api/add_participant', data={'name': 'Bench', 'tickets': '2'}))
+    route('POST /api/edit_participant',
+          call('POST', '/api/edit_participant', data={'id': str(participants // 2 + 1), 'name': 'Edited', 'tickets': '5'}))
+    route('POST /api/delete_participant',
+          lambda: call('POST', '/api/delete_participant', json={'id': winners.take()})())
+    route('POST /api/remove_prize',
+          lambda: call('POST', '/api/remove_prize', json={'participant_id': winners.take(), 'prize_index': 0})())
+    route('POST /api/prizes', call('POST', '/api/prizes', data={'name': 'Bench prize', 'quantity': '3'}))
+    route('PUT /api/prizes', call('PUT', '/api/prizes', data={'id': '1', 'description': 'Updated'}))
+    route('DELETE /api/prizes', lambda: call(
+        'DELETE', '/api/prizes', json={'prize_id': db.add_prize_to_pool('Disposable', None, None, 1)['id']})())
+    route('POST /api/pick_winner', call('POST', '/api/pick_winner', json={'prize_id': 1}), heavy)
+    route('POST /api/pick_winner (auto)', call('POST', '/api/pick_winner', json={'auto_select': True}), heavy)
+    route('POST /api/pick_winners', call('POST', '/api/pick_winners', json={'prizes': [{'prize_id': 2, 'quantity': 10}]}), heavy)
+    # A poller a few writes behind the head of the change log
+    since = db.get_changes(None)['version'] - 10
+    route('GET /api/changes (10 behind)', call('GET', f'/api/changes?since={since}'))
+    csv_body = 'name,tickets\n' + ''.join(f'Imported {i},1\n' for i in range(1000))
+    route('POST /api/import_participants (1000 rows)',
+          call('POST', '/api/import_participants', data=csv_body, content_type='text/csv'))
+    # A fresh event next to the seeded default one stays as fast as an empty roster
+    raffle_id = f'bench-{participants}'
+    client.post('/api/raffles', json={'id': raffle_id, 'name': 'Benchmark event'})
+    route('GET /api/events/<id>/get_participants (new event)',
+          call('GET', f'/api/events/{raffle_id}/get_participants'))
+    route('GET /api/metrics', call('GET', '/api/metrics'))
+    route('GET /api/events (connect)', lambda: client.get('/api/events', buffered=False).close())
+
+    photo = raffle_app.participant_photos.save_bytes(os.urandom(50_000), '.jpg')
+    route('GET /api/uploads/participants/<photo>', call('GET', f'/api/uploads/participants/{photo}'))
+    route('GET /api/uploads/participants/<photo> (304)',
+          call('GET', f'/api/uploads/participants/{photo}', 304, headers={'If-None-Match': f'"{photo}"'}))
+
+    route('GET /api/backup', call('GET', '/api/backup'), heavy)
+    route('GET /api/export', call('GET', '/api/export'), heavy)
+
+    # Destructive routes last
+    route('POST /api/clear_prizes', call('POST', '/api/clear_prizes'), 1)
+    route('POST /api/clear_all_data', call('POST', '/api/clear_all_data'), 1)
+    return results
+
+
+def bench_draw(participants: int, draws: int = 20) -> Dict[str, float]:
+    from draw_engine import DrawEngine
+
+    roster = [{'tickets': random.randint(1, 20), 'prizes': []} for _ in range(participants)]
+
+    # Previous pick_winner behaviour: expand every remaining ticket into a list per draw
+    start = time.perf_counter()
+    for _ in range(draws):
+        weighted = []
+        for participant in roster:
+            weighted.extend([participant] * participant['tickets'])
+        random.choice(weighted)
+    expanded = (time.perf_counter() - start) / draws
+
+    start = time.perf_counter()
+    engine = DrawEngine(roster, allow_multiple_wins=False)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(draws):
+        engine.record_win(engine.pick())
+    pick = (time.perf_counter() - start) / draws
+
+    print(f'draw over {participants} participants: list expansion {expanded * 1000:.2f} ms/draw, '
+          f'draw engine build {build * 1000:.2f} ms + {pick * 1e6:.1f} us/draw')
+    return {
+        'list_expansion_ms': round(expanded * 1000, 4),
+        'engine_build_ms': round(build * 1000, 4),
+        'engine_pick_us': round(pick * 1e6, 2),
+    }
+
+
+def _chi_square_limit(degrees: int, z: float = 3.09) -> float:
+    # Wilson-Hilferty approximation of the chi-square quantile; z=3.09 is p=0.001
+    k = degrees
+    return k * (1 - 2 / (9 * k) + z * (2 / (9 * k)) ** 0.5) ** 3
+
+
+def bench_draw_distribution(workdir: str, draws: int) -> Dict[str, Any]:
+    """Check that both draw paths pick winners with the chances the rules promise.
+
+    A small roster with mixed tickets and prize counts is drawn `draws` times
+    per mode through DrawEngine and through Database._pick_draw_winner. With
+    multiple wins on, everyone below their ticket count must come up equally
+    often; with it off, only prize-less participants, in proportion to their
+    tickets. Ineligible participants must never be picked, and the chi-square
+    statistic of the counts must stay under its p=0.001 limit.
+    """
+    from database import Database
+    from draw_engine import DrawEngine
+
+    # (tickets, prize_count): each mode has eligible and ineligible members
+    roster = [(1, 0), (2, 0), (3, 0), (5, 0), (8, 0), (2, 1), (3, 1), (4, 2), (1, 1), (3, 3), (10, 0), (6, 5)]
+    participants = [{'tickets': tickets, 'prize_count': prize_count} for tickets, prize_count in roster]
+
+    db = Database(os.path.join(workdir, 'draw-distribution.db'))
+    db.add_participants((f'Participant {i}', tickets, '🦁', None) for i, (tickets, _) in enumerate(roster))
+    with db.get_db() as conn:
+        ids = [row[0] for row in conn.execute('SELECT id FROM participants ORDER BY id')]
+        conn.executemany('UPDATE participants SET prize_count = ? WHERE id = ?',
+                         [(prize_count, id) for id, (_, prize_count) in zip(ids, roster)])
+        conn.commit()
+    index_of = {id: i for i, id in enumerate(ids)}
+
+    results = {}
+    for allow_multiple_wins in (False, True):
+        mode = 'multiple_wins' if allow_multiple_wins else 'single_win'
+        if allow_multiple_wins:
+            weights = [1 if prize_count < tickets else 0 for tickets, prize_count in roster]
+        else:
+            weights = [tickets if prize_count == 0 else 0 for tickets, prize_count in roster]
+        total = sum(weights)
+        eligible = [i for i, weight in enumerate(weights) if weight]
+        limit = _chi_square_limit(len(eligible) - 1)
+
+        engine = DrawEngine(participants, allow_multiple_wins, rng=random.Random(random.random()))
+        with db.get_db() as conn:
+            cursor = conn.cursor()
+            paths = {
+                'engine': lambda: engine.pick(),
+                'sql': lambda: index_of[db._pick_draw_winner(cursor, allow_multiple_wins)['id']],
+            }
+            for path, pick in paths.items():
+                counts = [0] * len(roster)
+                for _ in range(draws):
+                    counts[pick()] += 1
+                picked_ineligible = sum(counts[i] for i, weight in enumerate(weights) if not weight)
+                statistic = sum((counts[i] - draws * weights[i] / total) ** 2 / (draws * weights[i] / total)
+                                for i in eligible)
+
+                assert picked_ineligible == 0, f'{path} ({mode}) picked ineligible participants {picked_ineligible} times'
+                assert statistic < limit, f'{path} ({mode}) chi-square {statistic:.1f} over limit {limit:.1f}'
+                print(f'draw distribution ({mode}, {path}): {draws} draws over {len(eligible)} eligible, '
+                      f'chi-square {statistic:.1f} < {limit:.1f}')
+                results[f'{mode}.{path}.chi_square'] = round(statistic, 2)
+        results[f'{mode}.limit'] = round(limit, 2)
+    db.close()
+    return results
+
+
+def bench_draw_queries(workdir: str, participants: int, draws: int = 6, limit: int = 12) -> Dict[str, Any]:
+    """Check that one draw_winner issues the same few statements at any event size.
+
+    Counts come from the QueryTracer, for draws with and without an explicit
+    prize in both win modes, on a tiny event and on one with `participants`
+    people and 200 prizes. Every draw must issue the same number of
+    statements, and no more than `limit`; a count that grows with the roster
+    or the prize list means a per-row query crept back in.
+    """
+    from database import Database
+
+    counts = {}
+    for size, prizes in ((10, 1), (participants, 200)):
+        # A threshold no statement reaches: counting without slow-query logs
+        db = Database(os.path.join(workdir, f'draw-queries-{size}.db'), slow_query_ms=float('inf'))
+        db.add_participants((f'Participant {i}', 3, '🦁', None) for i in range(size))
+        for i in range(prizes):
+            db.add_prize_to_pool(f'Prize {i}', None, None, draws * 2)
+        for allow_multiple_wins in (False, True):
+            db.update_settings({'allow_multiple_wins': allow_multiple_wins})
+            mode = 'multiple_wins' if allow_multiple_wins else 'single_win'
+            for i in range(draws):
+                db.tracer.begin_request()
+                db.draw_winner(None if i % 2 else 1)
+                counts.setdefault(f'{size}/{prizes}.{mode}', []).append(db.tracer.request_query_count())
+        db.close()
+
+    distinct = {count for series in counts.values() for count in series}
+    assert len(distinct) == 1, f'draw_winner statement count varies with event size or mode: {counts}'
+    statements = distinct.pop()
+    assert statements <= limit, f'draw_winner issues {statements} statements, limit is {limit}'
+    print(f'draw_winner statements: {statements} per draw for 10 to {participants} participants '
+          f'and 1 to 200 prizes (limit {limit})')
+    return {'statements_per_draw': statements}
+
+
+def _load_draw_roster(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    # What draw_winner used to load before picking in SQL
+    cursor.execute('''
+        SELECT id, name, tickets, animal, photo_path, prize_count
+        FROM participants
+        ORDER BY id
+    ''')
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def bench_sql_draw(workdir: str, participants: int, draws: int = 20) -> Dict[str, float]:
+    from database import Database
+    from draw_engine import DrawEngine
+
+    db = Database(os.path.join(workdir, f'draw-{participants}.db'))
+    seed(db, participants)
+    results = {}
+    for allow_multiple_wins in (False, True):
+        mode = 'multiple_wins' if allow_multiple_wins else 'single_win'
+        with db.get_db() as conn:
+            cursor = conn.cursor()
+
+            # Previous draw_winner path: whole roster into Python, then a DrawEngine
+            start = time.perf_counter()
+            for _ in range(draws):
+                roster = _load_draw_roster(cursor)
+                roster[DrawEngine(roster, allow_multiple_wins).pick()]
+            python_ms = (time.perf_counter() - start) / draws * 1000
+
+            start = time.perf_counter()
+            for _ in range(draws):
+                db._pick_draw_winner(cursor, allow_multiple_wins)
+            sql_ms = (time.perf_counter() - start) / draws * 1000
+
+        print(f'draw over {participants} participants ({mode}): roster in Python {python_ms:.1f} ms, '
+              f'SQL cumulative-weight pick {sql_ms:.1f} ms')
+        results[f'{mode}.python_ms'] = round(python_ms, 3)
+        results[f'{mode}.sql_ms'] = round(sql_ms, 3)
+    db.close()
+    return results
+
+
+def _stress_worker(workdir: str, db_path: str, barrier) -> Dict[str, Any]:
+    raffle_app = load_app(workdir, db_path)
+    client = raffle_app.app.test_client()
+    drawn = 0
+    errors = {}
+    barrier.wait()
+    start = time.perf_counter()
+    while True:
+        response = client.post('/api/pick_winner', json={'auto_select': True})
+        if response.status_code == 200:
+            drawn += 1
+            continue
+        message = response.json['message']
+        if message in ('No prizes available', 'No eligible participants for this draw'):
+            break
+        errors[message] = errors.get(message, 0) + 1
+    return {'drawn': drawn, 'errors': errors, 'seconds': time.perf_counter() - start}
+
+
+def bench_stress(workdir: str, processes: int, participants: int = 2000, units: int = 3000) -> Dict[str, Any]:
+    """Parallel /api/pick_winner calls from many processes until every prize is gone.
+
+    Afterwards no prize may be over-assigned, nobody may hold more prizes than
+    tickets (or more than one with multiple wins off), and the counters must
+    match participant_prizes.
+    """
+    import multiprocessing
+    from database import Database
+
+    results = {}
+    for allow_multiple_wins in (False, True):
+        mode = 'multiple_wins' if allow_multiple_wins else 'single_win'
+        db_path = os.path.join(workdir, f'stress-{mode}.db')
+        db = Database(db_path)
+        db.add_participants((f'Participant {i}', random.randint(1, 3), '🦁', None) for i in range(participants))
+        for i in range(30):
+            db.add_prize_to_pool(f'Prize {i}', None, None, units // 30)
+        db.update_settings({'allow_multiple_wins': allow_multiple_wins})
+
+        context = multiprocessing.get_context('spawn')
+        barrier = context.Manager().Barrier(processes)
+        with context.Pool(processes) as pool:
+            outcomes = pool.starmap(_stress_worker, [(workdir, db_path, barrier)] * processes)
+        # Workers start together at the barrier, after importing the app
+        elapsed = max(outcome['seconds'] for outcome in outcomes)
+
+        drawn = sum(outcome['drawn'] for outcome in outcomes)
+        errors = {}
+        for outcome in outcomes:
+            for message, count in outcome['errors'].items():
+                errors[message] = errors.get(message, 0) + count
+
+        with db.get_db() as conn:
+            over_assigned = conn.execute('''
+                SELECT COUNT(*) FROM prizes z
+                WHERE (SELECT COUNT(*) FROM participant_prizes WHERE prize_id = z.id) > z.quantity
+            ''').fetchone()[0]
+            limit = 'p.tickets' if allow_multiple_wins else '1'
+            over_limit = conn.execute(f'''
+                SELECT COUNT(*) FROM participants p
+                WHERE (SELECT COUNT(*) FROM participant_prizes WHERE participant_id = p.id) > {limit}
+            ''').fetchone()[0]
+            assigned = conn.execute('SELECT COUNT(*) FROM participant_prizes').fetchone()[0]
+        mismatches = db.check_counters()
+        db.close()
+
+        assert over_assigned == 0, f'{over_assigned} prizes over-assigned'
+        assert over_limit == 0, f'{over_limit} participants over their limit'
+        assert assigned == drawn, f'{drawn} successful draws but {assigned} assignments'
+        assert not mismatches['participants'] and not mismatches['prizes'], mismatches
+        print(f'stress ({mode}): {processes} processes drew {drawn} winners in {elapsed:.2f} s '
+              f'({drawn / elapsed:,.0f} draws/s), limits and counters held, errors: {errors or "none"}')
+        results[mode] = {
+            'processes': processes,
+            'drawn': drawn,
+            'draws_per_second': round(drawn / elapsed),
+            'errors': errors,
+        }
+    return results
+
+
+def bench_import(client, rows: int) -> Dict[str, float]:
+    csv_body = 'name,tickets\n' + ''.join(f'Imported {i},{i % 5 + 1}\n' for i in range(rows))
+    start = time.perf_counter()
+    response = client.post('/api/import_participants', data=csv_body, content_type='text/csv')
+    elapsed = time.perf_counter() - start
+    assert response.json['imported'] == rows, response.json
+
+    # One /api/add_participant round trip per person, as before bulk import existed
+    sample = min(rows, 1000)
+    start = time.perf_counter()
+    for i in range(sample):
+        client.post('/api/add_participant', data={'name': f'Single {i}', 'tickets': '1'})
+    single = (time.perf_counter() - start) / sample
+
+    print(f'import {rows} rows: {elapsed:.2f} s ({rows / elapsed:,.0f} rows/s), '
+          f'one-by-one add_participant {1 / single:,.0f} rows/s')
+    return {
+        'rows': rows,
+        'bulk_rows_per_second': round(rows / elapsed),
+        'single_rows_per_second': round(1 / single),
+    }
+
+
+def bench_backup(workdir: str, rows: int) -> Dict[str, float]:
+    import backup
+    from database import Database
+
+    db = Database(os.path.join(workdir, 'backup-source.db'))
+    seed(db, rows)
+    total_rows = rows + rows // 2
+
+    # Writes keep landing while the online backup copies pages
+    latencies = []
+    done = threading.Event()
+
+    def writer():
+        while not done.is_set():
+            start = time.perf_counter()
+            db.add_participant('During backup', 1, '🦁', None)
+            latencies.append(time.perf_counter() - start)
+            time.sleep(0.001)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    result = backup.backup_database(db.db_path, os.path.join(workdir, 'backup-copy.db'))
+    done.set()
+    thread.join()
+
+    start = time.perf_counter()
+    with open(os.path.join(workdir, 'export.ndjson'), 'wb') as f:
+        for chunk in backup.iter_ndjson(db.db_path):
+            f.write(chunk)
+    ndjson_seconds = time.perf_counter() - start
+    tar_path = os.path.join(workdir, 'export.tar')
+    start = time.perf_counter()
+    with open(tar_path, 'wb') as f:
+        for chunk in backup.iter_tar(db.db_path, None):
+            f.write(chunk)
+    tar_seconds = time.perf_counter() - start
+    db.close()
+
+    target = Database(os.path.join(workdir, 'backup-restore.db'))
+    start = time.perf_counter()
+    with open(tar_path, 'rb') as f:
+        restored = backup.restore(target, f)
+    restore_seconds = time.perf_counter() - start
+    assert sum(restored['rows'].values()) >= total_rows, restored
+    assert not any(target.check_counters().values())
+    target.close()
+
+    print(f'backup {total_rows:,} rows: online copy {result["seconds"]:.2f} s in {result["steps"]} steps '
+          f'({result["bytes"] / 1e6:.0f} MB), {len(latencies)} writes meanwhile, '
+          f'slowest {max(latencies) * 1000:.1f} ms; export ndjson {ndjson_seconds:.2f} s, tar {tar_seconds:.2f} s; '
+          f'restore {restore_seconds:.2f} s ({total_rows / restore_seconds:,.0f} rows/s)')
+    return {
+        'rows': total_rows,
+        'backup_seconds': result['seconds'],
+        'backup_bytes': result['bytes'],
+        'writes_during_backup': len(latencies),
+        'max_write_ms_during_backup': round(max(latencies) * 1000, 2),
+        'export_ndjson_seconds': round(ndjson_seconds, 3),
+        'export_tar_seconds': round(tar_seconds, 3),
+        'restore_seconds': round(restore_seconds, 3),
+        'restore_rows_per_second': round(total_rows / restore_seconds),
+    }
+
+
+def _upload_server(workdir: str, db_path: str, ports):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    raffle_app = load_app(workdir, db_path)
+    server = make_server('127.0.0.1', 0, raffle_app.app, threaded=True, request_handler=QuietHandler)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def _peak_rss_mb(pid: int) -> float:
+    # Linux only: VmHWM is the process's peak resident set size
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError('VmHWM not available')
+
+
+def bench_uploads(workdir: str, registrations: int, concurrency: int = 8) -> Dict[str, Any]:
+    """Concurrent /api/add_participant registrations against a real server process.
+
+    The webcam photo is sent as a base64 form field (the old client) and as a
+    binary multipart file part. Peak RSS growth of the server process is
+    read from /proc, after one warm-up registration.
+    """
+    import base64
+    import cv2
+    import http.client
+    import multiprocessing
+    import numpy as np
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Noise compresses badly, so this is a large but realistic JPEG
+    image = np.random.default_rng(0).integers(0, 255, (1200, 1600, 3), dtype=np.uint8)
+    photo = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+    def multipart(fields: Dict[str, str], files: Dict[str, bytes]):
+        boundary = 'raffle-bench-boundary'
+        parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+                 for name, value in fields.items()]
+        for name, data in files.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="webcam.jpg"\r\n'
+                         f'Content-Type: image/jpeg\r\n\r\n'.encode() + data + b'\r\n')
+        parts.append(f'--{boundary}--\r\n'.encode())
+        return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+    bodies = {
+        'base64': multipart({'name': 'Bench', 'tickets': '1',
+                             'photo': 'data:image/jpeg;base64,' + base64.b64encode(photo).decode()}, {}),
+        'multipart': multipart({'name': 'Bench', 'tickets': '1'}, {'photo': photo}),
+    }
+
+    results = {'photo_bytes': len(photo), 'registrations': registrations, 'concurrency': concurrency}
+    context = multiprocessing.get_context('spawn')
+    for mode, (body, content_type) in bodies.items():
+        ports = context.Queue()
+        server = context.Process(target=_upload_server,
+                                 args=(workdir, os.path.join(workdir, f'uploads-{mode}.db'), ports), daemon=True)
+        server.start()
+        port = ports.get(timeout=60)
+
+        def register(_):
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            conn.request('POST', '/api/add_participant', body=body, headers={'Content-Type': content_type})
+            response = conn.getresponse()
+            payload = json.loads(response.read())
+            conn.close()
+            assert response.status == 200 and payload['participant']['photo_path'], payload
+
+        register(0)
+        before = _peak_rss_mb(server.pid)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(register, range(registrations)))
+        elapsed = time.perf_counter() - start
+        peak = _peak_rss_mb(server.pid)
+        server.terminate()
+        server.join()
+
+        results[mode] = {
+            'request_bytes': len(body),
+            'peak_rss_growth_mb': round(peak - before, 1),
+            'registrations_per_second': round(registrations / elapsed, 1),
+        }
+        print(f'uploads {mode:9}: {len(body) / 1e6:.2f} MB per request, peak RSS +{peak - before:.1f} MB, '
+              f'{registrations / elapsed:.1f} registrations/s at concurrency {concurrency}')
+    return results
+
+
+def bench_simulator(workdir: str, participants: int, units: int = 20, trials: int = 100_000) -> Dict[str, Any]:
+    import backup
+    from database import Database
+    from simulator import DrawSimulator
+
+    db_path = os.path.join(workdir, 'simulate.db')
+    db = Database(db_path)
+    db.add_participants((f'Participant {i}', random.randint(1, 5), '🦁', None) for i in range(participants))
+    for i in range(units // 2):
+        db.add_prize_to_pool(f'Prize {i}', None, None, 2)
+
+    results = {'participants': participants, 'units': units, 'trials': trials}
+    for allow_multiple_wins in (False, True):
+        mode = 'multiple_wins' if allow_multiple_wins else 'single_win'
+        simulated = DrawSimulator.from_database(db, seed=0, allow_multiple_wins=allow_multiple_wins).run(trials)
+
+        # The same ceremony replayed through draw_winner on a copy of the database
+        replay_path = os.path.join(workdir, f'simulate-{mode}.db')
+        backup.backup_database(db_path, replay_path)
+        replay = Database(replay_path)
+        replay.update_settings({'allow_multiple_wins': allow_multiple_wins})
+        start = time.perf_counter()
+        for _ in range(units):
+            replay.draw_winner()
+        replay_rate = units / (time.perf_counter() - start)
+        replay.close()
+
+        results[mode] = {
+            'simulated_draws_per_second': simulated['draws_per_second'],
+            'replayed_draws_per_second': round(replay_rate),
+            'max_first_draw_z': round(simulated['max_first_draw_z'], 2),
+        }
+        print(f'simulate {mode:13}: {simulated["draws"]:,} draws at {simulated["draws_per_second"]:,}/s '
+              f'vs draw_winner {replay_rate:,.0f}/s; first draw within '
+              f'{simulated["max_first_draw_z"]:.1f} standard errors of the exact odds')
+    db.close()
+    return results
+
+
+def _traced(load: Callable[[], Any]):
+    """Run `load`; returns its result, the bytes it still holds on to and the peak while it ran."""
+    import gc
+    import tracemalloc
+
+    gc.collect()
+    tracemalloc.start()
+    value = load()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, retained, peak
+
+
+def _load_roster(roster, cursor, version: int):
+    roster.load(cursor, version)
+    return roster
+
+
+def bench_roster(workdir: str, participants: int, edits: int = 1000) -> Dict[str, Any]:
+    from database import Database
+    from roster import CompactRoster
+
+    db = Database(os.path.join(workdir, f'roster-{participants}.db'))
+    seed(db, participants)
+    results = {'participants': participants}
+    with db.get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        version = db._change_version(cursor)
+        for name, load in (('dict_list', lambda: db._select_participants(cursor)),
+                           ('compact_roster', lambda: _load_roster(CompactRoster(), cursor, version))):
+            start = time.perf_counter()
+            load()
+            elapsed = time.perf_counter() - start
+            _, retained, peak = _traced(load)
+            results[name] = {'load_ms': round(elapsed * 1000, 1), 'retained_mb': round(retained / 2 ** 20, 1),
+                             'peak_mb': round(peak / 2 ** 20, 1)}
+            print(f'roster of {participants:,} as {name:14}: {retained / participants:6.0f} bytes/participant, '
+                  f'{retained / 2 ** 20:7.1f} MB held, {peak / 2 ** 20:7.1f} MB peak, loaded in {elapsed * 1000:,.0f} ms')
+        conn.rollback()
+
+    # Cold draw loads the roster; later ones only read what changed in between
+    for label in ('cold', 'warm'):
+        start = time.perf_counter()
+        db.draw_winners([{'prize_id': 1, 'quantity': 10}])
+        results[f'draw_winners_{label}_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    db.add_participants((f'Late {i}', 1, '🦁', None) for i in range(edits))
+    start = time.perf_counter()
+    db.draw_winners([{'prize_id': 1, 'quantity': 10}])
+    results['draw_winners_after_edits_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    print(f'draw_winners (10 units): cold {results["draw_winners_cold_ms"]:,.1f} ms, '
+          f'warm {results["draw_winners_warm_ms"]:,.1f} ms, '
+          f'after {edits:,} new participants {results["draw_winners_after_edits_ms"]:,.1f} ms')
+    db.close()
+    return results
+
+
+def bench_json(raffle_app, workdir: str, participants: int) -> Dict[str, Any]:
+    from json_provider import FastJSONProvider
+
+    app = raffle_app.app
+    db = use_database(raffle_app, os.path.join(workdir, f'json-{participants}.db'))
+    seed(db, participants)
+    client = app.test_client()
+    fast = app.json
+    stdlib = FastJSONProvider(app)
+    stdlib.use_orjson = False
+    modes = (('stdlib', stdlib, ''), ('streamed', stdlib, '?stream=true'))
+    if fast.use_orjson:
+        modes += (('orjson', fast, ''), ('orjson_stream', fast, '?stream=true'))
+
+    def fetch(query: str):
+        # A fresh version so neither the read cache nor the response cache answers
+        db.bump_version()
+        start = time.perf_counter()
+        response = client.get('/api/get_participants' + query, buffered=False)
+        chunks = iter(response.response)
+        size = len(next(chunks))
+        first = time.perf_counter() - start
+        size += sum(len(chunk) for chunk in chunks)
+        response.close()
+        return first, time.perf_counter() - start, size
+
+    results = {'participants': participants}
+    for name, provider, query in modes:
+        app.json = provider
+        fetch(query)
+        first, total, size = fetch(query)
+        _, _, peak = _traced(lambda: fetch(query))
+        results[name] = {'first_byte_ms': round(first * 1000, 1), 'total_ms': round(total * 1000, 1),
+                         'peak_mb': round(peak / 2 ** 20, 1), 'bytes': size}
+        print(f'GET /api/get_participants over {participants:,} ({name:13}): first byte {first * 1000:8,.1f} ms, '
+              f'complete {total * 1000:8,.1f} ms, peak {peak / 2 ** 20:7.1f} MB, {size / 2 ** 20:.1f} MB body')
+    app.json = fast
+    return results
+
+
+def bench_photos(workdir: str, photos: int) -> Dict[str, int]:
+    import cv2
+    import numpy as np
+    from image_pipeline import ImagePipeline, VARIANTS, FORMATS, variant_filename
+
+    folder = os.path.join(workdir, 'photo-variants')
+    os.makedirs(folder, exist_ok=True)
+    pipeline = ImagePipeline()
+    rng = np.random.default_rng(0)
+    totals = {'original': 0}
+    start = time.perf_counter()
+    for i in range(photos):
+        # Smooth noise at webcam resolution stands in for a real capture
+        image = cv2.GaussianBlur(rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8), (31, 31), 0)
+        path = os.path.join(folder, f'photo_{i}.jpg')
+        cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, 95])
+        totals['original'] += os.path.getsize(path)
+        pipeline.process(path)
+        for variant in VARIANTS:
+            for fmt in FORMATS:
+                key = f'{variant}.{fmt}'
+                totals[key] = totals.get(key, 0) + os.path.getsize(os.path.join(folder, variant_filename(f'photo_{i}.jpg', variant, fmt)))
+    elapsed = time.perf_counter() - start
+    pipeline.shutdown()
+
+    print(f'{photos} photos, {elapsed / photos * 1000:.1f} ms each to generate variants; page payload bytes:')
+    for key, total in totals.items():
+        print(f'  {key:14} {total:12,d} ({total / totals["original"]:.1%})')
+    return totals
+
+
+def bench_fanout(subscribers: int, events: int = 200) -> Dict[str, float]:
+    from broadcaster import Broadcaster
+
+    broadcaster = Broadcaster(heartbeat=0.5)
+    received = [0] * subscribers
+
+    def consume(index, subscription):
+        for message in broadcaster.stream(subscription):
+            if message.startswith('id:'):
+                received[index] += 1
+
+    for index in range(subscribers):
+        threading.Thread(target=consume, args=(index, broadcaster.subscribe()), daemon=True).start()
+
+    start = time.perf_counter()
+    for i in range(events):
+        broadcaster.publish('participant_added', {'id': str(i), 'name': f'Participant {i}'})
+    publish = (time.perf_counter() - start) / events
+    while sum(received) < subscribers * events and time.perf_counter() - start < 60:
+        time.sleep(0.05)
+    delivered = time.perf_counter() - start
+    broadcaster.close()
+
+    assert sum(received) == subscribers * events, f'{sum(received)} of {subscribers * events} delivered'
+    print(f'SSE fan-out to {subscribers} subscribers: publish {publish * 1e6:.1f} us/event, '
+          f'{events} events delivered to all in {delivered:.2f} s')
+    return {
+        'subscribers': subscribers,
+        'publish_us': round(publish * 1e6, 2),
+        'delivery_seconds': round(delivered, 3),
+    }
+
+
+def load_app(workdir: str, db_path: str):
+    """Import app.py with its databases and upload folders redirected into workdir."""
+    os.chdir(workdir)
+    os.environ['RAFFLE_EVENTS_DIR'] = os.path.join(workdir, 'events')
+    import app as raffle_app
+
+    use_database(raffle_app, db_path)
+    return raffle_app
+
+
+def use_database(raffle_app, db_path: str):
+    """Serve the unscoped /api routes from a fresh database (and uploads/) in the workdir."""
+    previous = raffle_app.raffles.default
+    raffle_app.raffles.default = raffle_app.raffles.build(
+        'default', db_path, os.path.join(os.path.dirname(db_path), 'uploads'))
+    previous.close()
+    return raffle_app.raffles.default.db
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_delta_ms: float) -> int:
+    regressions = 0
+    print(f'\ncomparison with baseline (threshold {threshold:.0%}):')
+    for size, groups in results['sizes'].items():
+        for group, operations in groups.items():
+            for name, current in operations.items():
+                previous = baseline.get('sizes', {}).get(size, {}).get(group, {}).get(name)
+                if not previous:
+                    continue
+                before, after = previous['median_ms'], current['median_ms']
+                change = (after - before) / before if before else 0.0
+                flag = ''
+                # Sub-millisecond operations jitter by more than the threshold on their own
+                if change > threshold and after - before > min_delta_ms:
+                    flag = '  REGRESSION'
+                    regressions += 1
+                print(f'  [{size:>8}] {group}.{name:48} {before:10.3f} -> {after:10.3f} ms {change:+7.1%}{flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000', help='comma-separated participant counts to seed')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per operation (heavy reads cap at 3 for 100k+)')
+    parser.add_argument('--output', help='write results JSON to this file')
+    parser.add_argument('--baseline', help='compare against a previous results JSON')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='relative slowdown of a median that counts as a regression')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                        help='ignore slowdowns smaller than this many milliseconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--draw-participants', type=int, default=0)
+    parser.add_argument('--sql-draw', type=int, default=0)
+    parser.add_argument('--stress-processes', type=int, default=0)
+    parser.add_argument('--draw-distribution', type=int, default=0)
+    parser.add_argument('--draw-queries', type=int, default=0)
+    parser.add_argument('--import-rows', type=int, default=0)
+    parser.add_argument('--photos', type=int, default=0)
+    parser.add_argument('--subscribers', type=int, default=0)
+    parser.add_argument('--backup-rows', type=int, default=0)
+    parser.add_argument('--uploads', type=int, default=0)
+    parser.add_argument('--simulate', type=int, default=0)
+    parser.add_argument('--roster', type=int, default=0)
+    parser.add_argument('--json-rows', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp(prefix='raffle-bench-')
+    raffle_app = load_app(workdir, os.path.join(workdir, 'app.db'))
+    from database import Database
+
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'sizes': {},
+        'scenarios': {},
+    }
+
+    for size in [int(value) for value in args.sizes.split(',') if value]:
+        print(f'== {size:,} participants')
+        start = time.perf_counter()
+        db = Database(os.path.join(workdir, f'db-{size}.db'))
+        prizes = seed(db, size)
+        print(f'   seeded in {time.perf_counter() - start:.1f} s')
+        database_results = bench_database(db, size, prizes, args.repeat)
+        db.close()
+
+        seed(use_database(raffle_app, os.path.join(workdir, f'routes-{size}.db')), size)
+        route_results = bench_routes(raffle_app, size, args.repeat)
+
+        results['sizes'][str(size)] = {'database': database_results, 'routes': route_results}
+        for group, operations in results['sizes'][str(size)].items():
+            for name, stats in operations.items():
+                print(f'   {group:8} {name:52} {stats["median_ms"]:10.3f} ms')
+
+    use_database(raffle_app, os.path.join(workdir, 'scenarios.db'))
+    if args.draw_participants:
+        results['scenarios']['draw_engine'] = bench_draw(args.draw_participants)
+    if args.sql_draw:
+        results['scenarios']['sql_draw'] = bench_sql_draw(workdir, args.sql_draw)
+    if args.stress_processes:
+        results['scenarios']['stress'] = bench_stress(workdir, args.stress_processes)
+    if args.draw_distribution:
+        results['scenarios']['draw_distribution'] = bench_draw_distribution(workdir, args.draw_distribution)
+    if args.draw_queries:
+        results['scenarios']['draw_queries'] = bench_draw_queries(workdir, args.draw_queries)
+    if args.import_rows:
+        results['scenarios']['import'] = bench_import(raffle_app.app.test_client(), args.import_rows)
+    if args.photos:
+        results['scenarios']['photos'] = bench_photos(workdir, args.photos)
+    if args.subscribers:
+        results['scenarios']['fanout'] = bench_fanout(args.subscribers)
+    if args.backup_rows:
+        results['scenarios']['backup'] = bench_backup(workdir, args.backup_rows)
+    if args.uploads:
+        results['scenarios']['uploads'] = bench_uploads(workdir, args.uploads)
+    if args.simulate:
+        results['scenarios']['simulator'] = bench_simulator(workdir, args.simulate)
+    if args.roster:
+        results['scenarios']['roster'] = bench_roster(workdir, args.roster)
+    if args.json_rows:
+        results['scenarios']['json'] = bench_json(raffle_app, workdir, args.json_rows)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f'{regressions} regressions')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
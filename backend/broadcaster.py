@@ -0,0 +1,112 @@
+import itertools
+import json
+import queue
+import threading
+from typing import Any, Iterator, Optional
+
+# Queued by close() to end the dispatcher thread
+_STOP = object()
+
+class Subscription:
+    def __init__(self, max_queue: int):
+        self.queue = queue.Queue(maxsize=max_queue)
+        # Set when the subscriber fell behind and missed messages
+        self.lagging = False
+        self.closed = False
+
+class Broadcaster:
+    """Fan-out of server-sent events to any number of subscribers.
+
+    publish() serializes a message once and queues it for a dispatcher thread,
+    so request handlers pay O(1) regardless of how many clients are listening.
+    The dispatcher hands it to every subscriber queue with put_nowait; a
+    subscriber whose queue is full is flagged as lagging and told to resync
+    instead of stalling everyone else.
+    """
+
+    def __init__(self, max_queue: int = 256, heartbeat: float = 15.0):
+        self.max_queue = max_queue
+        self.heartbeat = heartbeat
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._outbox = queue.Queue()
+        self._dispatcher = None
+        self._closed = False
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscription.closed = True
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event: str, data: Any = None):
+        if not self._subscribers or self._closed:
+            return
+        message = f"id: {next(self._ids)}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+        self._outbox.put(message)
+        if self._dispatcher is None:
+            with self._lock:
+                if self._dispatcher is None and not self._closed:
+                    self._dispatcher = threading.Thread(target=self._dispatch, name='sse-dispatcher', daemon=True)
+                    self._dispatcher.start()
+
+    def _dispatch(self):
+        while True:
+            message = self._outbox.get()
+            if message is _STOP:
+                return
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for subscription in subscribers:
+                try:
+                    subscription.queue.put_nowait(message)
+                except queue.Full:
+                    subscription.lagging = True
+
+    def close(self):
+        """Disconnect every subscriber and stop the dispatcher thread."""
+        with self._lock:
+            self._closed = True
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+            dispatcher = self._dispatcher
+        for subscription in subscribers:
+            subscription.closed = True
+        if dispatcher is not None:
+            # Anything queued ahead of the sentinel is drained first; nobody is left to receive it
+            self._outbox.put(_STOP)
+            dispatcher.join()
+
+    def stream(self, subscription: Subscription) -> Iterator[str]:
+        """Yield SSE frames for one subscriber until it disconnects."""
+        try:
+            yield 'retry: 3000\n\n'
+            while not subscription.closed:
+                if subscription.lagging:
+                    # Drop the backlog; the client refetches full state instead
+                    while True:
+                        try:
+                            subscription.queue.get_nowait()
+                        except queue.Empty:
+                            break
+                    subscription.lagging = False
+                    yield 'event: resync\ndata: {}\n\n'
+                    continue
+                try:
+                    message: Optional[str] = subscription.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield message
+        finally:
+            self.unsubscribe(subscription)
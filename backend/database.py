@@ -1,21 +1,256 @@
+import functools
 import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
 from contextlib import contextmanager
-from typing import List, Dict, Any, Optional
+from itertools import islice
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
 import json
+import random
+from draw_engine import DrawEngine
+from raffle_settings import RaffleSettings, validate_settings
+from read_cache import VersionedCache
+from roster import CompactRoster
+from sql_trace import QueryTracer
+
+class PoolTimeout(TimeoutError):
+    """No pooled connection became free in time."""
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections.
+
+    Connections are configured once (WAL journal, statement cache) and handed
+    back warm on every checkout. At most `size` connections are open at a time;
+    connections left idle longer than `idle_timeout` seconds are closed. A
+    checkout waits at most `acquire_timeout` seconds, so an exhausted pool
+    fails with PoolTimeout instead of hanging.
+    """
+
+    def __init__(self, db_path: str, size: int = 5, idle_timeout: float = 300.0,
+                 cached_statements: int = 256, busy_timeout: float = 5.0,
+                 tracer: Optional[QueryTracer] = None, acquire_timeout: float = 30.0):
+        self.db_path = db_path
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.cached_statements = cached_statements
+        self.busy_timeout = busy_timeout
+        self.tracer = tracer
+        self._idle = deque()  # (connection, last_used) pairs, most recent on the right
+        self._open = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        # Checkouts that found every connection busy, and the time spent waiting
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        if self.tracer is not None:
+            self.tracer.attach(conn)
+        return conn
+
+    @property
+    def open_count(self) -> int:
+        return self._open
+
+    def _evict_idle(self):
+        # Oldest idle connections sit on the left
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._idle and self._idle[0][1] < cutoff:
+            conn, _ = self._idle.popleft()
+            conn.close()
+            self._open -= 1
+
+    def acquire(self, timeout: Optional[float] = None) -> sqlite3.Connection:
+        deadline = time.monotonic() + (self.acquire_timeout if timeout is None else timeout)
+        waited_since = None
+        with self._cond:
+            try:
+                while True:
+                    if self._closed:
+                        raise RuntimeError('Connection pool is closed')
+                    self._evict_idle()
+                    if self._idle:
+                        conn, _ = self._idle.pop()
+                        return conn
+                    if self._open < self.size:
+                        self._open += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout('Timed out waiting for a database connection')
+                    if waited_since is None:
+                        waited_since = time.monotonic()
+                        self.waits += 1
+                    self._cond.wait(remaining)
+            finally:
+                if waited_since is not None:
+                    self.wait_seconds += time.monotonic() - waited_since
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn: sqlite3.Connection, discard: bool = False):
+        if not discard and conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                discard = True
+        if self.tracer is not None:
+            self.tracer.finish(conn)
+
+        with self._cond:
+            if discard or self._closed:
+                conn.close()
+                self._open -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._evict_idle()
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                conn.close()
+                self._open -= 1
+            self._cond.notify_all()
+
+_MISSING = object()
+
+# Bounded retries for writes that hit SQLITE_BUSY past the busy timeout, and
+# for optimistic draws whose pick was invalidated by a concurrent draw
+BUSY_RETRIES = 3
+DRAW_ATTEMPTS = 5
+
+def is_busy_error(error: sqlite3.Error) -> bool:
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is None:
+        return 'locked' in str(error) or 'busy' in str(error)
+    return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+def retry_on_busy(method):
+    """Re-run a write a bounded number of times when SQLite stays busy, with jittered backoff."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        for attempt in range(BUSY_RETRIES):
+            try:
+                return method(self, *args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == BUSY_RETRIES - 1:
+                    raise
+                time.sleep(random.uniform(0.01, 0.05) * (2 ** attempt))
+    return wrapper
+
+def mutating(method):
+    """Bump the Database write version after a method that may change data."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.bump_version()
+    return wrapper
+
+def cached_read(method):
+    """Serve a read method from the read-model cache while the data version is unchanged.
+
+    Cached results are shared between callers and must be treated as read-only.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        version = self.version()
+        result = self._read_cache.get(key, version, _MISSING)
+        if result is _MISSING:
+            result = method(self, *args, **kwargs)
+            self._read_cache.put(key, version, result)
+        return result
+    return wrapper
 
 class Database:
-    def __init__(self, db_path: str = 'raffle.db'):
+    def __init__(self, db_path: str = 'raffle.db', pool_size: int = 5, idle_timeout: float = 300.0,
+                 cache_entries: int = 128, slow_query_ms: Optional[float] = None,
+                 compact_interval: Optional[float] = None):
         self.db_path = db_path
+        # Statement tracing and the slow-query log are off unless a threshold is given
+        self.tracer = QueryTracer(db_path, slow_ms=slow_query_ms) if slow_query_ms is not None else None
+        self.pool = ConnectionPool(db_path, size=pool_size, idle_timeout=idle_timeout, tracer=self.tracer)
+        self._read_cache = VersionedCache(cache_entries)
+        self._write_version = 0
+        # Tells this instance's versions apart from an earlier one on the same
+        # file, whose counters may have reached the same values
+        self._instance = uuid.uuid4().hex
+        self._version_lock = threading.Lock()
+        # (data version, settings version, RaffleSettings) of the last settings read
+        self._settings = None
+        # Draw roster kept current from the change log; only used under the write lock
+        self._roster = CompactRoster()
+        # Never writes, so its data_version moves whenever any other connection
+        # (pooled or in another process) commits
+        self._watch_conn = sqlite3.connect(db_path, check_same_thread=False)
         self.init_db()
 
+        # Background change-log compaction, stopped by close()
+        self._stop = threading.Event()
+        if compact_interval:
+            threading.Thread(target=self._compact_periodically, args=(compact_interval,),
+                             name='change-log-compactor', daemon=True).start()
+
+    def bump_version(self):
+        with self._version_lock:
+            self._write_version += 1
+
+    def version(self) -> tuple:
+        """Current data version: instance token, local write counter and SQLite's data_version."""
+        with self._version_lock:
+            data_version = self._watch_conn.execute('PRAGMA data_version').fetchone()[0]
+            return (self._instance, self._write_version, data_version)
+
     @contextmanager
     def get_db(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        conn = self.pool.acquire()
+        discard = False
         try:
             yield conn
+        except sqlite3.DatabaseError:
+            # Don't hand a possibly broken connection to the next caller
+            discard = not self._is_usable(conn)
+            raise
         finally:
-            conn.close()
+            self.pool.release(conn, discard=discard)
+
+    @staticmethod
+    def _is_usable(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._stop.set()
+        self.pool.close()
+        self._watch_conn.close()
+        if self.tracer is not None:
+            self.tracer.close()
 
     def init_db(self):
         with self.get_db() as conn:
@@ -29,6 +264,7 @@ class Database:
                     tickets INTEGER NOT NULL,
                     animal TEXT NOT NULL,
                     photo_path TEXT,
+                    prize_count INTEGER NOT NULL DEFAULT 0,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
@@ -41,6 +277,7 @@ class Database:
                     description TEXT,
                     photo_path TEXT,
                     quantity INTEGER DEFAULT 1,
+                    assigned_count INTEGER NOT NULL DEFAULT 0,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
@@ -75,44 +312,414 @@ class Database:
                 VALUES ('allow_multiple_wins', 'true')
             ''')
 
+            self._upgrade_schema(cursor)
             conn.commit()
 
+    def _upgrade_schema(self, cursor: sqlite3.Cursor):
+        # Bumped by triggers on every settings write, from any process
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS settings_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('INSERT OR IGNORE INTO settings_version (id, version) VALUES (1, 0)')
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS settings_version_{event.lower()}
+                AFTER {event} ON settings
+                BEGIN
+                    UPDATE settings_version SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+        self._create_change_log(cursor)
+        self._create_photo_refs(cursor)
+
+        # Counter columns for databases created before they existed
+        backfill = False
+        cursor.execute('PRAGMA table_info(participants)')
+        if 'prize_count' not in [row['name'] for row in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE participants ADD COLUMN prize_count INTEGER NOT NULL DEFAULT 0')
+            backfill = True
+        cursor.execute('PRAGMA table_info(prizes)')
+        if 'assigned_count' not in [row['name'] for row in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE prizes ADD COLUMN assigned_count INTEGER NOT NULL DEFAULT 0')
+            backfill = True
+
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_participant_prizes_participant ON participant_prizes (participant_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_participant_prizes_prize ON participant_prizes (prize_id)')
+        # Remaining-ticket orderings used by get_participants_page, one per allow_multiple_wins mode
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_participants_remaining_multi ON participants (tickets - prize_count, id)')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_participants_remaining_single
+            ON participants ((CASE WHEN prize_count = 0 THEN tickets ELSE 0 END), id)
+        ''')
+
+        # Keep the counters in step with participant_prizes
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS participant_prizes_count_insert
+            AFTER INSERT ON participant_prizes
+            BEGIN
+                UPDATE participants SET prize_count = prize_count + 1 WHERE id = NEW.participant_id;
+                UPDATE prizes SET assigned_count = assigned_count + 1 WHERE id = NEW.prize_id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS participant_prizes_count_delete
+            AFTER DELETE ON participant_prizes
+            BEGIN
+                UPDATE participants SET prize_count = prize_count - 1 WHERE id = OLD.participant_id;
+                UPDATE prizes SET assigned_count = assigned_count - 1 WHERE id = OLD.prize_id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS participant_prizes_count_update
+            AFTER UPDATE OF participant_id, prize_id ON participant_prizes
+            BEGIN
+                UPDATE participants SET prize_count = prize_count - 1 WHERE id = OLD.participant_id;
+                UPDATE prizes SET assigned_count = assigned_count - 1 WHERE id = OLD.prize_id;
+                UPDATE participants SET prize_count = prize_count + 1 WHERE id = NEW.participant_id;
+                UPDATE prizes SET assigned_count = assigned_count + 1 WHERE id = NEW.prize_id;
+            END
+        ''')
+
+        if backfill:
+            self._repair_counters(cursor)
+
+    def _create_change_log(self, cursor: sqlite3.Cursor):
+        """Change log behind /api/changes, filled by triggers so every writer is covered.
+
+        Each row says an entity was upserted or deleted at a version; clients
+        fetch the current state of whatever changed after their last version.
+        change_log.compacted_through is the oldest version a client may still
+        sync from after compaction dropped tombstones. The newest row is never
+        deleted, so a plain rowid keeps versions increasing without the extra
+        sqlite_sequence write AUTOINCREMENT costs on every logged change.
+
+        A log created over existing rows knows nothing about them, so its
+        horizon starts past a marker row: clients syncing from 0 get a reset.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'changes'")
+        created = cursor.fetchone() is None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS changes (
+                version INTEGER PRIMARY KEY,
+                entity TEXT NOT NULL,
+                entity_id TEXT NOT NULL,
+                op TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                compacted_through INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('INSERT OR IGNORE INTO change_log (id, compacted_through) VALUES (1, 0)')
+        if created:
+            cursor.execute('SELECT EXISTS (SELECT 1 FROM participants) OR EXISTS (SELECT 1 FROM prizes)')
+            if cursor.fetchone()[0]:
+                cursor.execute("INSERT INTO changes (entity, entity_id, op) VALUES ('settings', 'settings', 'upsert')")
+                cursor.execute('UPDATE change_log SET compacted_through = ? WHERE id = 1', (cursor.lastrowid,))
+
+        for table, entity in (('participants', 'participant'), ('prizes', 'prize')):
+            for event, row, op in (('INSERT', 'NEW', 'upsert'), ('UPDATE', 'NEW', 'upsert'), ('DELETE', 'OLD', 'delete')):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {table}_changes_{event.lower()}
+                    AFTER {event} ON {table}
+                    BEGIN
+                        INSERT INTO changes (entity, entity_id, op) VALUES ('{entity}', {row}.id, '{op}');
+                    END
+                ''')
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS settings_changes_{event.lower()}
+                AFTER {event} ON settings
+                BEGIN
+                    INSERT INTO changes (entity, entity_id, op) VALUES ('settings', 'settings', 'upsert');
+                END
+            ''')
+
+        # Participant and prize payloads embed each other's names
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS prizes_changes_rename
+            AFTER UPDATE OF name ON prizes
+            WHEN NEW.name IS NOT OLD.name
+            BEGIN
+                INSERT INTO changes (entity, entity_id, op)
+                SELECT 'participant', participant_id, 'upsert' FROM participant_prizes WHERE prize_id = NEW.id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS participants_changes_rename
+            AFTER UPDATE OF name ON participants
+            WHEN NEW.name IS NOT OLD.name
+            BEGIN
+                INSERT INTO changes (entity, entity_id, op)
+                SELECT 'prize', prize_id, 'upsert' FROM participant_prizes WHERE participant_id = NEW.id;
+            END
+        ''')
+
+    def _create_photo_refs(self, cursor: sqlite3.Cursor):
+        """Reference counts of photo_path values, kept by triggers on participants and prizes.
+
+        A path whose count drops to 0 gets released_at set, so the photo
+        collector can find orphans without scanning either table.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'photo_refs'")
+        backfill = cursor.fetchone() is None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS photo_refs (
+                path TEXT PRIMARY KEY,
+                refs INTEGER NOT NULL,
+                released_at INTEGER
+            )
+        ''')
+        if backfill:
+            cursor.execute('''
+                INSERT INTO photo_refs (path, refs)
+                SELECT photo_path, COUNT(*) FROM (
+                    SELECT photo_path FROM participants UNION ALL SELECT photo_path FROM prizes
+                )
+                WHERE photo_path IS NOT NULL AND photo_path != ''
+                GROUP BY photo_path
+            ''')
+
+        acquire = '''
+            INSERT INTO photo_refs (path, refs)
+            SELECT NEW.photo_path, 1 WHERE NEW.photo_path IS NOT NULL AND NEW.photo_path != ''
+            ON CONFLICT (path) DO UPDATE SET refs = refs + 1, released_at = NULL;
+        '''
+        release = '''
+            UPDATE photo_refs
+            SET refs = refs - 1,
+                released_at = CASE WHEN refs = 1 THEN CAST(strftime('%s', 'now') AS INTEGER) END
+            WHERE path = OLD.photo_path;
+        '''
+        for table in ('participants', 'prizes'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_photo_refs_insert
+                AFTER INSERT ON {table}
+                WHEN NEW.photo_path IS NOT NULL AND NEW.photo_path != ''
+                BEGIN {acquire} END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_photo_refs_update
+                AFTER UPDATE OF photo_path ON {table}
+                WHEN NEW.photo_path IS NOT OLD.photo_path
+                BEGIN {release} {acquire} END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_photo_refs_delete
+                AFTER DELETE ON {table}
+                WHEN OLD.photo_path IS NOT NULL AND OLD.photo_path != ''
+                BEGIN {release} END
+            ''')
+
+    def _count_mismatches(self, cursor: sqlite3.Cursor) -> Dict[str, List[Dict[str, int]]]:
+        cursor.execute('''
+            SELECT p.id, p.prize_count as stored, COUNT(pr.id) as actual
+            FROM participants p
+            LEFT JOIN participant_prizes pr ON p.id = pr.participant_id
+            GROUP BY p.id
+            HAVING stored != actual
+        ''')
+        participants = [dict(row) for row in cursor.fetchall()]
+        cursor.execute('''
+            SELECT ap.id, ap.assigned_count as stored, COUNT(pr.id) as actual
+            FROM prizes ap
+            LEFT JOIN participant_prizes pr ON ap.id = pr.prize_id
+            GROUP BY ap.id
+            HAVING stored != actual
+        ''')
+        prizes = [dict(row) for row in cursor.fetchall()]
+        return {'participants': participants, 'prizes': prizes}
+
+    def _repair_counters(self, cursor: sqlite3.Cursor):
+        cursor.execute('''
+            UPDATE participants
+            SET prize_count = (SELECT COUNT(*) FROM participant_prizes WHERE participant_id = participants.id)
+            WHERE prize_count != (SELECT COUNT(*) FROM participant_prizes WHERE participant_id = participants.id)
+        ''')
+        cursor.execute('''
+            UPDATE prizes
+            SET assigned_count = (SELECT COUNT(*) FROM participant_prizes WHERE prize_id = prizes.id)
+            WHERE assigned_count != (SELECT COUNT(*) FROM participant_prizes WHERE prize_id = prizes.id)
+        ''')
+
+    def check_counters(self, repair: bool = False) -> Dict[str, List[Dict[str, int]]]:
+        """Compare prize_count/assigned_count with participant_prizes.
+
+        Returns the rows whose stored counter disagrees with the actual count,
+        and rewrites them when `repair` is set. Only a repair that writes
+        bumps the data version, so a plain check keeps the read caches warm.
+        """
+        with self.get_db() as conn:
+            cursor = conn.cursor()
+            mismatches = self._count_mismatches(cursor)
+            if repair and (mismatches['participants'] or mismatches['prizes']):
+                try:
+                    self._repair_counters(cursor)
+                    conn.commit()
+                finally:
+                    self.bump_version()
+            return mismatches
+
+    @cached_read
     def get_participants(self) -> List[Dict[str, Any]]:
+        with self.get_db() as conn:
+            return self._select_participants(conn.cursor())
+
+    def _select_participants(self, cursor: sqlite3.Cursor, where: str = '', params: tuple = ()) -> List[Dict[str, Any]]:
+        self._query_participants(cursor, where, params)
+        return [self._participant_from_row(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _query_participants(cursor: sqlite3.Cursor, where: str = '', params: tuple = (),
+                            order: str = 'p.created_at DESC'):
+        # Get participants with their prizes
+        cursor.execute(f'''
+            SELECT 
+                p.id,
+                p.name,
+                p.tickets,
+                p.animal,
+                p.photo_path,
+                CASE WHEN p.prize_count > 0 THEN (
+                    SELECT GROUP_CONCAT(ap.name)
+                    FROM participant_prizes pr
+                    JOIN prizes ap ON pr.prize_id = ap.id
+                    WHERE pr.participant_id = p.id
+                ) END as prizes
+            FROM participants p
+            {where}
+            ORDER BY {order}
+        ''', params)
+
+    @staticmethod
+    def _participant_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'id': str(row['id']),
+            'name': row['name'],
+            'tickets': row['tickets'],
+            'animal': row['animal'],
+            'photo_path': row['photo_path'],
+            'prizes': row['prizes'].split(',') if row['prizes'] else []
+        }
+
+    @contextmanager
+    def _stream_cursor(self):
+        """Cursor on a connection of its own, inside one read transaction.
+
+        Streamed responses are read at the client's pace; a private
+        connection, as in backup.iter_ndjson, keeps them off the pool.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=self.pool.busy_timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN')
+            yield cursor
+        finally:
+            conn.close()
+
+    def iter_participants(self, batch: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Participants from one cursor, in /api/get_participants order.
+
+        Those who can still win come first, newest first within each group;
+        rows are fetched `batch` at a time, so memory does not grow with the roster.
+        """
+        allow_multiple_wins = self.settings().allow_multiple_wins
+        with self._stream_cursor() as cursor:
+            if allow_multiple_wins:
+                can_win = 'p.tickets > p.prize_count'
+            else:
+                can_win = 'p.prize_count = 0'
+            self._query_participants(cursor, order=f'{can_win} DESC, p.created_at DESC')
+            while True:
+                rows = cursor.fetchmany(batch)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._participant_from_row(row)
+
+    @cached_read
+    def get_participants_page(self, limit: int = 100, after: Optional[str] = None, eligible_only: bool = False,
+                              has_won: Optional[bool] = None, name_prefix: Optional[str] = None) -> Dict[str, Any]:
+        """Return one page of participants ordered by remaining tickets, then newest first.
+
+        `after` is the `next_cursor` of the previous page. Remaining tickets follow
+        the draw rules: with allow_multiple_wins off a winner has none left.
+        """
         with self.get_db() as conn:
             cursor = conn.cursor()
-            
-            # Get all participants with their prizes
-            cursor.execute('''
+            allow_multiple_wins = self.settings(cursor).allow_multiple_wins
+
+            # Matches the expression indexes created in _upgrade_schema
+            if allow_multiple_wins:
+                remaining = 'p.tickets - p.prize_count'
+            else:
+                remaining = 'CASE WHEN p.prize_count = 0 THEN p.tickets ELSE 0 END'
+
+            conditions = []
+            params = []
+            if eligible_only:
+                conditions.append(f'{remaining} > 0')
+            if has_won is not None:
+                conditions.append('p.prize_count > 0' if has_won else 'p.prize_count = 0')
+            if name_prefix:
+                escaped = name_prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                conditions.append("p.name LIKE ? ESCAPE '\\'")
+                params.append(escaped + '%')
+            if after:
+                try:
+                    after_remaining, after_id = (int(part) for part in after.split(':', 1))
+                except ValueError:
+                    raise ValueError('Invalid cursor')
+                conditions.append(f'({remaining} < ? OR ({remaining} = ? AND p.id < ?))')
+                params.extend([after_remaining, after_remaining, after_id])
+            params.append(limit)
+
+            cursor.execute(f'''
                 SELECT 
                     p.id,
                     p.name,
                     p.tickets,
                     p.animal,
                     p.photo_path,
-                    GROUP_CONCAT(ap.name) as prizes
+                    {remaining} as remaining,
+                    CASE WHEN p.prize_count > 0 THEN (
+                        SELECT GROUP_CONCAT(ap.name)
+                        FROM participant_prizes pr
+                        JOIN prizes ap ON pr.prize_id = ap.id
+                        WHERE pr.participant_id = p.id
+                    ) END as prizes
                 FROM participants p
-                LEFT JOIN participant_prizes pr ON p.id = pr.participant_id
-                LEFT JOIN prizes ap ON pr.prize_id = ap.id
-                GROUP BY p.id
-                ORDER BY p.created_at DESC
-            ''')
-            
+                {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                ORDER BY {remaining} DESC, p.id DESC
+                LIMIT ?
+            ''', params)
+
             rows = cursor.fetchall()
-            participants = []
-            
-            for row in rows:
-                participant = {
-                    'id': str(row['id']),
-                    'name': row['name'],
-                    'tickets': row['tickets'],
-                    'animal': row['animal'],
-                    'photo_path': row['photo_path'],
-                    'prizes': row['prizes'].split(',') if row['prizes'] else []
-                }
-                participants.append(participant)
-            
-            return participants
+            participants = [{
+                'id': str(row['id']),
+                'name': row['name'],
+                'tickets': row['tickets'],
+                'animal': row['animal'],
+                'photo_path': row['photo_path'],
+                'prizes': row['prizes'].split(',') if row['prizes'] else []
+            } for row in rows]
 
+            next_cursor = None
+            if len(rows) == limit:
+                next_cursor = f"{rows[-1]['remaining']}:{rows[-1]['id']}"
+
+            return {
+                'participants': participants,
+                'next_cursor': next_cursor
+            }
+
+    @cached_read
     def get_participant(self, participant_id: int) -> Optional[Dict[str, Any]]:
         with self.get_db() as conn:
             cursor = conn.cursor()
@@ -124,12 +731,14 @@ class Database:
                     p.tickets,
                     p.animal,
                     p.photo_path,
-                    GROUP_CONCAT(ap.name) as prizes
+                    CASE WHEN p.prize_count > 0 THEN (
+                        SELECT GROUP_CONCAT(ap.name)
+                        FROM participant_prizes pr
+                        JOIN prizes ap ON pr.prize_id = ap.id
+                        WHERE pr.participant_id = p.id
+                    ) END as prizes
                 FROM participants p
-                LEFT JOIN participant_prizes pr ON p.id = pr.participant_id
-                LEFT JOIN prizes ap ON pr.prize_id = ap.id
                 WHERE p.id = ?
-                GROUP BY p.id
             ''', (participant_id,))
             
             row = cursor.fetchone()
@@ -145,44 +754,61 @@ class Database:
                 'prizes': row['prizes'].split(',') if row['prizes'] else []
             }
 
+    @cached_read
     def get_prizes(self) -> List[Dict[str, Any]]:
         with self.get_db() as conn:
-            cursor = conn.cursor()
-            
-            # Get all available prizes and their assignment status
-            cursor.execute('''
-                SELECT 
-                    ap.id,
-                    ap.name,
-                    ap.description,
-                    ap.photo_path,
-                    ap.quantity,
-                    COUNT(pr.id) as assigned_count,
-                    GROUP_CONCAT(p.name) as winners
-                FROM prizes ap
-                LEFT JOIN participant_prizes pr ON ap.id = pr.prize_id
-                LEFT JOIN participants p ON pr.participant_id = p.id
-                GROUP BY ap.id
-                ORDER BY ap.created_at DESC
-            ''')
-            
-            rows = cursor.fetchall()
-            prizes = []
-            
-            for row in rows:
-                prize = {
-                    'id': str(row['id']),
-                    'name': row['name'],
-                    'description': row['description'],
-                    'photo_path': row['photo_path'],
-                    'quantity': row['quantity'],
-                    'remaining': row['quantity'] - (row['assigned_count'] or 0),
-                    'winners': row['winners'].split(',') if row['winners'] else []
-                }
-                prizes.append(prize)
-            
-            return prizes
+            return self._select_prizes(conn.cursor())
+
+    def _select_prizes(self, cursor: sqlite3.Cursor, where: str = '', params: tuple = ()) -> List[Dict[str, Any]]:
+        self._query_prizes(cursor, where, params)
+        return [self._prize_from_row(row) for row in cursor.fetchall()]
+
+    def iter_prizes(self, batch: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Prizes from one cursor, in get_prizes order, fetched `batch` rows at a time."""
+        with self._stream_cursor() as cursor:
+            self._query_prizes(cursor)
+            while True:
+                rows = cursor.fetchmany(batch)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._prize_from_row(row)
 
+    @staticmethod
+    def _query_prizes(cursor: sqlite3.Cursor, where: str = '', params: tuple = ()):
+        # Get prizes and their assignment status
+        cursor.execute(f'''
+            SELECT 
+                ap.id,
+                ap.name,
+                ap.description,
+                ap.photo_path,
+                ap.quantity,
+                ap.assigned_count,
+                CASE WHEN ap.assigned_count > 0 THEN (
+                    SELECT GROUP_CONCAT(p.name)
+                    FROM participant_prizes pr
+                    JOIN participants p ON pr.participant_id = p.id
+                    WHERE pr.prize_id = ap.id
+                ) END as winners
+            FROM prizes ap
+            {where}
+            ORDER BY ap.created_at DESC
+        ''', params)
+
+    @staticmethod
+    def _prize_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'id': str(row['id']),
+            'name': row['name'],
+            'description': row['description'],
+            'photo_path': row['photo_path'],
+            'quantity': row['quantity'],
+            'remaining': row['quantity'] - (row['assigned_count'] or 0),
+            'winners': row['winners'].split(',') if row['winners'] else []
+        }
+
+    @mutating
     def add_prize_to_pool(self, name: str, description: str = None, photo_path: str = None, quantity: int = 1) -> Dict[str, Any]:
         with self.get_db() as conn:
             cursor = conn.cursor()
@@ -205,6 +831,7 @@ class Database:
                 'winners': []
             }
 
+    @mutating
     def update_prize(self, prize_id: int, name: str = None, description: str = None, photo_path: str = None, quantity: int = None) -> Dict[str, Any]:
         with self.get_db() as conn:
             cursor = conn.cursor()
@@ -217,13 +844,7 @@ class Database:
             
             # Check if quantity update is valid
             if quantity is not None:
-                cursor.execute('''
-                    SELECT COUNT(*) as assigned_count
-                    FROM participant_prizes
-                    WHERE prize_id = ?
-                ''', (prize_id,))
-                assigned_count = cursor.fetchone()['assigned_count']
-                if assigned_count > quantity:
+                if current_prize['assigned_count'] > quantity:
                     raise ValueError('Cannot reduce quantity below number of assigned prizes')
             
             # Build update query dynamically
@@ -256,13 +877,14 @@ class Database:
             cursor.execute('''
                 SELECT 
                     p.*,
-                    COUNT(pr.id) as assigned_count,
-                    GROUP_CONCAT(part.name) as winners
+                    CASE WHEN p.assigned_count > 0 THEN (
+                        SELECT GROUP_CONCAT(part.name)
+                        FROM participant_prizes pr
+                        JOIN participants part ON pr.participant_id = part.id
+                        WHERE pr.prize_id = p.id
+                    ) END as winners
                 FROM prizes p
-                LEFT JOIN participant_prizes pr ON p.id = pr.prize_id
-                LEFT JOIN participants part ON pr.participant_id = part.id
                 WHERE p.id = ?
-                GROUP BY p.id
             ''', (prize_id,))
             
             row = cursor.fetchone()
@@ -276,13 +898,15 @@ class Database:
                 'winners': row['winners'].split(',') if row['winners'] else []
             }
 
+    @mutating
     def remove_prize_from_pool(self, prize_id: int):
         with self.get_db() as conn:
             cursor = conn.cursor()
             
             # Check if prize is assigned to any participant
-            cursor.execute('SELECT id FROM participant_prizes WHERE prize_id = ?', (prize_id,))
-            if cursor.fetchone():
+            cursor.execute('SELECT assigned_count FROM prizes WHERE id = ?', (prize_id,))
+            row = cursor.fetchone()
+            if row and row['assigned_count'] > 0:
                 raise ValueError('Cannot remove prize that is assigned to a participant')
             
             cursor.execute('DELETE FROM prizes WHERE id = ?', (prize_id,))
@@ -291,6 +915,7 @@ class Database:
             
             conn.commit()
 
+    @mutating
     def add_participant(self, name: str, tickets: int, animal: str, photo_path: str = None) -> Dict[str, Any]:
         with self.get_db() as conn:
             cursor = conn.cursor()
@@ -312,6 +937,37 @@ class Database:
                 'prizes': []
             }
 
+    @mutating
+    def add_participants(self, participants: Iterable[Tuple[str, int, str, Optional[str]]], batch_size: int = 1000) -> int:
+        """Bulk insert (name, tickets, animal, photo_path) rows.
+
+        The iterable is consumed lazily, one executemany per batch, so
+        arbitrarily large imports run in constant memory. All batches share one
+        transaction: if the iterable raises partway, nothing is inserted.
+        Returns the number of rows inserted.
+        """
+        inserted = 0
+        iterator = iter(participants)
+        with self.get_db() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+                while True:
+                    batch = list(islice(iterator, batch_size))
+                    if not batch:
+                        break
+                    cursor.executemany('''
+                        INSERT INTO participants (name, tickets, animal, photo_path)
+                        VALUES (?, ?, ?, ?)
+                    ''', batch)
+                    inserted += len(batch)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return inserted
+
+    @mutating
     def update_participant(self, id: int, name: str = None, tickets: int = None, photo_path: str = None) -> Dict[str, Any]:
         with self.get_db() as conn:
             cursor = conn.cursor()
@@ -330,13 +986,7 @@ class Database:
                 params.append(name)
             if tickets is not None:
                 # Check if new ticket count is valid
-                cursor.execute('''
-                    SELECT COUNT(*) as prize_count
-                    FROM participant_prizes
-                    WHERE participant_id = ?
-                ''', (id,))
-                prize_count = cursor.fetchone()['prize_count']
-                if prize_count > tickets:
+                if current['prize_count'] > tickets:
                     raise ValueError('Cannot reduce tickets below number of prizes won')
                 updates.append('tickets = ?')
                 params.append(tickets)
@@ -358,12 +1008,14 @@ class Database:
             cursor.execute('''
                 SELECT 
                     p.*,
-                    GROUP_CONCAT(ap.name) as prizes
+                    CASE WHEN p.prize_count > 0 THEN (
+                        SELECT GROUP_CONCAT(ap.name)
+                        FROM participant_prizes pr
+                        JOIN prizes ap ON pr.prize_id = ap.id
+                        WHERE pr.participant_id = p.id
+                    ) END as prizes
                 FROM participants p
-                LEFT JOIN participant_prizes pr ON p.id = pr.participant_id
-                LEFT JOIN prizes ap ON pr.prize_id = ap.id
                 WHERE p.id = ?
-                GROUP BY p.id
             ''', (id,))
             
             row = cursor.fetchone()
@@ -376,6 +1028,7 @@ class Database:
                 'prizes': row['prizes'].split(',') if row['prizes'] else []
             }
 
+    @mutating
     def delete_participant(self, id: int):
         with self.get_db() as conn:
             cursor = conn.cursor()
@@ -403,54 +1056,293 @@ class Database:
                 conn.rollback()
                 raise e
 
+    @mutating
+    @retry_on_busy
     def add_prize(self, participant_id: int, prize_id: int):
         with self.get_db() as conn:
             cursor = conn.cursor()
-            
-            # First check if participant has reached their ticket limit
-            cursor.execute('''
-                SELECT p.tickets, COUNT(pr.id) as prize_count
-                FROM participants p
-                LEFT JOIN participant_prizes pr ON p.id = pr.participant_id
-                WHERE p.id = ?
-                GROUP BY p.id
-            ''', (participant_id,))
-            
+            if self._assign_if_available(cursor, participant_id, prize_id):
+                conn.commit()
+                return
+            conn.rollback()
+
+            # Nothing was inserted; work out which limit stopped it
+            cursor.execute('SELECT tickets, prize_count FROM participants WHERE id = ?', (participant_id,))
             result = cursor.fetchone()
             if not result:
                 raise ValueError('Participant not found')
-                
-            tickets = result['tickets']
-            prize_count = result['prize_count'] or 0
-            
-            if prize_count >= tickets:
+            if result['prize_count'] >= result['tickets']:
                 raise ValueError('Participant has reached their maximum number of prizes')
 
-            # Check if prize has available quantity
-            cursor.execute('''
-                SELECT quantity, (
-                    SELECT COUNT(*) 
-                    FROM participant_prizes 
-                    WHERE prize_id = prizes.id
-                ) as assigned_count
-                FROM prizes
-                WHERE id = ?
-            ''', (prize_id,))
-            
+            cursor.execute('SELECT quantity, assigned_count FROM prizes WHERE id = ?', (prize_id,))
             result = cursor.fetchone()
             if not result:
                 raise ValueError('Prize not found')
-            
-            if result['assigned_count'] >= result['quantity']:
+            raise ValueError('Prize has reached its maximum quantity')
+
+    @staticmethod
+    def _assign_if_available(cursor: sqlite3.Cursor, participant_id: int, prize_id: int,
+                             single_win: bool = False) -> bool:
+        """Assign a prize only if the participant and the prize still have room.
+
+        The limit checks and the insert are one statement, which takes the write
+        lock before it reads, so concurrent writers (threads or processes) can
+        never over-assign a prize or exceed a participant's tickets.
+        """
+        cursor.execute('''
+            INSERT INTO participant_prizes(participant_id, prize_id)
+            SELECT p.id, z.id
+            FROM participants p, prizes z
+            WHERE p.id = ? AND z.id = ?
+              AND p.prize_count < p.tickets
+              AND (? = 0 OR p.prize_count = 0)
+              AND z.assigned_count < z.quantity
+        ''', (participant_id, prize_id, single_win))
+        return cursor.rowcount == 1
+
+    @staticmethod
+    def _load_winner_details(cursor: sqlite3.Cursor, roster: CompactRoster,
+                             indices: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Winner rows for _winner_payload; the roster has no animal or photo, so those are read here."""
+        ids = sorted({roster.ids[i] for i in indices})
+        details = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            cursor.execute(f'''
+                SELECT id, animal, photo_path
+                FROM participants
+                WHERE id IN ({', '.join('?' * len(chunk))})
+            ''', chunk)
+            for row in cursor.fetchall():
+                details[row['id']] = dict(row)
+        for i in indices:
+            winner = details[roster.ids[i]]
+            winner['name'] = roster.name(i)
+            winner['tickets'] = roster.tickets[i]
+        return details
+
+    def _load_draw_prizes(self, cursor: sqlite3.Cursor, prize_id: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
+        cursor.execute('''
+            SELECT id, name, photo_path, quantity, assigned_count
+            FROM prizes
+            WHERE ? IS NULL OR id = ?
+            ORDER BY created_at, id
+        ''', (prize_id, prize_id))
+        return {row['id']: dict(row) for row in cursor.fetchall()}
+
+    def _pick_draw_winner(self, cursor: sqlite3.Cursor, allow_multiple_wins: bool) -> Optional[Dict[str, Any]]:
+        """Weighted random pick of one eligible participant, done in SQLite.
+
+        Eligible participants are grouped by their remaining-ticket expression
+        straight off its index, and a cumulative SUM() OVER those groups maps a
+        random ticket offset to a group. An OFFSET into that group's index range
+        then finds the participant, so a draw never loads the roster into Python.
+        """
+        if allow_multiple_wins:
+            # Everyone below their ticket count has an equal chance
+            remaining, weight = 'tickets - prize_count', '1'
+        else:
+            # Only participants without a prize, weighted by their tickets
+            remaining = '(CASE WHEN prize_count = 0 THEN tickets ELSE 0 END)'
+            weight = remaining
+        cursor.execute(f'''
+            SELECT {remaining} AS remaining, COUNT(*) AS members,
+                   SUM(COUNT(*) * {weight}) OVER (ORDER BY {remaining}) AS cumulative
+            FROM participants
+            WHERE {remaining} > 0
+            GROUP BY {remaining}
+            ORDER BY {remaining}
+        ''')
+        groups = cursor.fetchall()
+        if not groups:
+            return None
+
+        offset = random.randrange(groups[-1]['cumulative'])
+        start = 0
+        for group in groups:
+            if offset < group['cumulative']:
+                break
+            start = group['cumulative']
+        # Members of a group have equal weight and own consecutive offsets in id order
+        member = (offset - start) // ((group['cumulative'] - start) // group['members'])
+        cursor.execute(f'''
+            SELECT id, name, tickets, animal, photo_path
+            FROM participants
+            WHERE {remaining} = ?
+            ORDER BY id
+            LIMIT 1 OFFSET ?
+        ''', (group['remaining'], member))
+        return dict(cursor.fetchone())
+
+    @staticmethod
+    def _winner_payload(winner: Dict[str, Any], prize: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'participant_id': str(winner['id']),
+            'prize_id': str(prize['id']),
+            'winner': winner['name'],
+            'tickets': winner['tickets'],
+            'animal': winner['animal'],
+            'photo': winner['photo_path'],
+            'prize': prize['name'],
+            'prize_photo': prize['photo_path']
+        }
+
+    @mutating
+    @retry_on_busy
+    def draw_winner(self, prize_id: Optional[int] = None) -> Dict[str, Any]:
+        """Draw one winner and assign the prize.
+
+        With prize_id None a prize with remaining quantity is picked at random
+        (auto selection). Returns the pick_winner response payload.
+
+        Optimistic: the pick reads without holding the write lock, and the
+        assignment is a conditional insert that re-checks both limits
+        atomically. If a concurrent draw got there first the pick is redrawn
+        from fresh state, a bounded number of times.
+        """
+        with self.get_db() as conn:
+            cursor = conn.cursor()
+            for _ in range(DRAW_ATTEMPTS):
+                result = self._try_draw(cursor, prize_id)
+                if result is not None:
+                    conn.commit()
+                    return result
+                conn.rollback()
+            raise ValueError('The draw kept conflicting with other draws, please try again')
+
+    def _try_draw(self, cursor: sqlite3.Cursor, prize_id: Optional[int]) -> Optional[Dict[str, Any]]:
+        """One optimistic draw attempt; None when the pick lost a race."""
+        # Before the snapshot opens, so a settings read can refill the cache
+        allow_multiple_wins = self.settings(cursor).allow_multiple_wins
+        # A deferred transaction gives the pick one consistent snapshot without taking the write lock
+        cursor.execute('BEGIN')
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM participants)')
+        if not cursor.fetchone()[0]:
+            raise ValueError('No participants in the raffle')
+
+        prizes = self._load_draw_prizes(cursor, prize_id)
+        if prize_id is None:
+            available = [p for p in prizes.values() if p['quantity'] > p['assigned_count']]
+            if not available:
+                raise ValueError('No prizes available')
+            prize = random.choice(available)
+        else:
+            prize = prizes.get(prize_id)
+            if not prize:
+                raise ValueError('Prize not found')
+            if prize['assigned_count'] >= prize['quantity']:
                 raise ValueError('Prize has reached its maximum quantity')
-            
-            cursor.execute('''
-                INSERT INTO participant_prizes(participant_id, prize_id)
-                VALUES (?, ?)
-            ''', (participant_id, prize_id))
-            
-            conn.commit()
 
+        winner = self._pick_draw_winner(cursor, allow_multiple_wins)
+        if winner is None:
+            raise ValueError('No eligible participants for this draw')
+        cursor.connection.commit()
+
+        if not self._assign_if_available(cursor, winner['id'], prize['id'], single_win=not allow_multiple_wins):
+            return None
+        return self._winner_payload(winner, prize)
+
+    @staticmethod
+    def _parse_prize_quantities(prize_quantities: Any) -> List[Tuple[int, int]]:
+        """Check a draw_winners request and turn it into (prize_id, quantity) pairs."""
+        if not isinstance(prize_quantities, list):
+            raise ValueError('Prizes must be a list of {"prize_id", "quantity"} entries or "all"')
+        parsed = []
+        for entry in prize_quantities:
+            if not isinstance(entry, dict):
+                raise ValueError('Each prize entry must be an object with a prize_id')
+            if 'prize_id' not in entry:
+                raise ValueError('Each prize entry needs a prize_id')
+            try:
+                prize_id = int(entry['prize_id'])
+            except (TypeError, ValueError):
+                raise ValueError('Invalid prize id') from None
+            try:
+                quantity = int(entry.get('quantity', 1))
+            except (TypeError, ValueError):
+                quantity = 0
+            if quantity < 1:
+                raise ValueError('Invalid prize quantity')
+            parsed.append((prize_id, quantity))
+        return parsed
+
+    @mutating
+    @retry_on_busy
+    def draw_winners(self, prize_quantities: Optional[List[Dict[str, int]]]) -> Dict[str, Any]:
+        """Draw many winners in one transaction.
+
+        `prize_quantities` is a list of {'prize_id', 'quantity'} entries, or None
+        to draw every remaining prize unit. Winners are drawn without
+        replacement under the same ticket and quantity limits as add_prize.
+        """
+        if prize_quantities is not None:
+            # Malformed requests fail before the write lock is taken
+            prize_quantities = self._parse_prize_quantities(prize_quantities)
+        with self.get_db() as conn:
+            cursor = conn.cursor()
+            allow_multiple_wins = self.settings(cursor).allow_multiple_wins
+            cursor.execute('BEGIN IMMEDIATE')
+
+            roster = self._roster
+            try:
+                roster.sync(cursor)
+            except Exception:
+                roster.reset()
+                raise
+            if len(roster) == roster.deleted:
+                raise ValueError('No participants in the raffle')
+            prizes = self._load_draw_prizes(cursor)
+
+            # Resolve how many units of each prize to draw
+            if prize_quantities is None:
+                plan = [(prize_id, prize['quantity'] - prize['assigned_count'])
+                        for prize_id, prize in prizes.items()]
+            else:
+                requested = {}
+                for prize_id, quantity in prize_quantities:
+                    if prize_id not in prizes:
+                        raise ValueError('Prize not found')
+                    requested[prize_id] = requested.get(prize_id, 0) + quantity
+                for prize_id, quantity in requested.items():
+                    prize = prizes[prize_id]
+                    if prize['assigned_count'] + quantity > prize['quantity']:
+                        raise ValueError('Prize has reached its maximum quantity')
+                plan = list(requested.items())
+
+            # Wins are recorded straight into the roster's prize counts
+            engine = DrawEngine(roster, allow_multiple_wins)
+            drawn = []
+            unfilled = 0
+            try:
+                for prize_id, quantity in plan:
+                    for _ in range(quantity):
+                        index = engine.pick()
+                        if index is None:
+                            unfilled += 1
+                            continue
+                        engine.record_win(index)
+                        drawn.append((index, prize_id))
+
+                cursor.executemany('''
+                    INSERT INTO participant_prizes(participant_id, prize_id)
+                    VALUES (?, ?)
+                ''', [(roster.ids[index], prize_id) for index, prize_id in drawn])
+                details = self._load_winner_details(cursor, roster, [index for index, _ in drawn])
+                # The counter triggers logged these wins; the roster already holds them
+                roster.version = self._change_version(cursor)
+                conn.commit()
+            except Exception:
+                roster.reset()
+                raise
+
+            winners = [self._winner_payload(details[roster.ids[index]], prizes[prize_id])
+                       for index, prize_id in drawn]
+            return {
+                'winners': winners,
+                'unfilled': unfilled
+            }
+
+    @mutating
     def remove_prize(self, participant_id: int, prize_index: int):
         with self.get_db() as conn:
             cursor = conn.cursor()
@@ -475,12 +1367,14 @@ class Database:
             cursor.execute('DELETE FROM participant_prizes WHERE id = ?', (prize_id,))
             conn.commit()
 
+    @mutating
     def clear_prizes(self):
         with self.get_db() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM participant_prizes')
             conn.commit()
 
+    @mutating
     def clear_all_data(self):
         with self.get_db() as conn:
             cursor = conn.cursor()
@@ -489,24 +1383,184 @@ class Database:
                 cursor.execute('DELETE FROM participant_prizes')
                 cursor.execute('DELETE FROM prizes')
                 cursor.execute('DELETE FROM participants')
+                # Every synced client has to start over; keep only the newest row
+                version = self._change_version(cursor)
+                cursor.execute('DELETE FROM changes WHERE version < ?', (version,))
+                cursor.execute('UPDATE change_log SET compacted_through = ? WHERE id = 1', (version,))
                 conn.commit()
             except Exception as e:
                 conn.rollback()
                 raise e
 
-    def get_settings(self) -> Dict[str, Any]:
+    @staticmethod
+    def _change_version(cursor: sqlite3.Cursor) -> int:
+        cursor.execute('SELECT COALESCE(MAX(version), 0) FROM changes')
+        return cursor.fetchone()[0]
+
+    def get_changes(self, since: Optional[int], limit: int = 1000) -> Dict[str, Any]:
+        """Current state of everything that changed after change-log version `since`.
+
+        Returns {'version', 'reset': False, 'more', 'participants': {'upserted',
+        'deleted'}, 'prizes': {...}, 'settings'}. Clients pass `version` back as
+        the next `since`; `more` means the limit cut the batch short. 'reset' is
+        True, with no deltas, when `since` is missing, ahead of the log or
+        older than its compacted part; the client then refetches the full lists
+        and syncs from the returned version.
+        """
         with self.get_db() as conn:
             cursor = conn.cursor()
+            # One snapshot for the log and the rows it points at
+            cursor.execute('BEGIN')
+            version = self._change_version(cursor)
+            cursor.execute('SELECT compacted_through FROM change_log WHERE id = 1')
+            horizon = cursor.fetchone()[0]
+            if since is None or since < horizon or since > version:
+                return {'version': version, 'reset': True}
+
+            cursor.execute('''
+                SELECT version, entity, entity_id, op
+                FROM changes
+                WHERE version > ?
+                ORDER BY version
+                LIMIT ?
+            ''', (since, limit))
+            rows = cursor.fetchall()
+            more = len(rows) == limit
+            if more:
+                version = rows[-1]['version']
+
+            # Only the latest operation per entity matters
+            latest = {}
+            for row in rows:
+                latest[(row['entity'], row['entity_id'])] = row['op']
+            changed = {'participant': [], 'prize': []}
+            deleted = {'participant': [], 'prize': []}
+            settings_changed = False
+            for (entity, entity_id), op in latest.items():
+                if entity == 'settings':
+                    settings_changed = True
+                elif op == 'delete':
+                    deleted[entity].append(entity_id)
+                else:
+                    changed[entity].append(int(entity_id))
+
+            def placeholders(ids):
+                return ','.join('?' * len(ids))
+
+            participants = self._select_participants(
+                cursor, f"WHERE p.id IN ({placeholders(changed['participant'])})", tuple(changed['participant'])
+            ) if changed['participant'] else []
+            prizes = self._select_prizes(
+                cursor, f"WHERE ap.id IN ({placeholders(changed['prize'])})", tuple(changed['prize'])
+            ) if changed['prize'] else []
+
+            return {
+                'version': version,
+                'reset': False,
+                'more': more,
+                'participants': {'upserted': participants, 'deleted': deleted['participant']},
+                'prizes': {'upserted': prizes, 'deleted': deleted['prize']},
+                'settings': self.settings(cursor).to_dict() if settings_changed else None
+            }
+
+    def compact_changes(self, keep_deletes: int = 10000) -> int:
+        """Shrink the change log; returns the number of rows removed.
+
+        Rows superseded by a newer change to the same entity are always safe to
+        drop. Tombstones older than the last `keep_deletes` versions are dropped
+        too, which moves the horizon: clients behind it get a reset.
+        """
+        with self.get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                DELETE FROM changes
+                WHERE version NOT IN (SELECT MAX(version) FROM changes GROUP BY entity, entity_id)
+            ''')
+            removed = cursor.rowcount
+            # The newest row always stays; it carries the current version
+            horizon = self._change_version(cursor) - max(keep_deletes, 1)
+            cursor.execute("DELETE FROM changes WHERE op = 'delete' AND version <= ?", (horizon,))
+            if cursor.rowcount:
+                removed += cursor.rowcount
+                cursor.execute('''
+                    UPDATE change_log SET compacted_through = MAX(compacted_through, ?) WHERE id = 1
+                ''', (horizon,))
+            conn.commit()
+            return removed
+
+    def _compact_periodically(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.compact_changes()
+            except (sqlite3.Error, RuntimeError):
+                # Busy or closing; try again next round
+                continue
+
+    def claim_released_photos(self, released_before: float, limit: int = 200) -> List[str]:
+        """Take up to `limit` photo paths that nothing has referenced since `released_before`.
+
+        The rows are deleted as they are claimed; a path that gets referenced
+        again later simply starts a new count.
+        """
+        with self.get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT path FROM photo_refs
+                WHERE refs <= 0 AND released_at <= ?
+                ORDER BY released_at
+                LIMIT ?
+            ''', (int(released_before), limit))
+            paths = [row['path'] for row in cursor.fetchall()]
+            cursor.executemany('DELETE FROM photo_refs WHERE path = ? AND refs <= 0', [(path,) for path in paths])
+            conn.commit()
+            return paths
+
+    def referenced_photos(self) -> List[str]:
+        with self.get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT path FROM photo_refs WHERE refs > 0')
+            return [row['path'] for row in cursor.fetchall()]
+
+    def settings(self, cursor: Optional[sqlite3.Cursor] = None) -> RaffleSettings:
+        """Typed settings, parsed once and shared until they change.
+
+        Unchanged data version: served from memory without a query. Otherwise
+        only the settings_version row is read, and the settings table is
+        reloaded when that moved. Pass a cursor to avoid checking out a second
+        connection. A cursor inside a transaction reads that snapshot, which
+        may predate the version just read, so its result is not cached; hot
+        paths call settings() before they BEGIN.
+        """
+        version = self.version()
+        cached = self._settings
+        if cached is not None and cached[0] == version:
+            return cached[2]
+        if cursor is None:
+            with self.get_db() as conn:
+                return self._load_settings(conn.cursor(), version, cached)
+        return self._load_settings(cursor, version, cached, store=not cursor.connection.in_transaction)
+
+    def _load_settings(self, cursor: sqlite3.Cursor, version: tuple, cached: Optional[tuple],
+                       store: bool = True) -> RaffleSettings:
+        cursor.execute('SELECT version FROM settings_version WHERE id = 1')
+        settings_version = cursor.fetchone()[0]
+        if cached is not None and cached[1] == settings_version:
+            settings = cached[2]
+        else:
             cursor.execute('SELECT key, value FROM settings')
-            settings = {}
-            for row in cursor.fetchall():
-                try:
-                    settings[row['key']] = json.loads(row['value'].lower())
-                except json.JSONDecodeError:
-                    settings[row['key']] = row['value']
-            return settings
+            settings = RaffleSettings.from_rows({row['key']: row['value'] for row in cursor.fetchall()})
+        if store:
+            self._settings = (version, settings_version, settings)
+        return settings
+
+    def get_settings(self) -> Dict[str, Any]:
+        return self.settings().to_dict()
 
+    @mutating
     def update_settings(self, settings: Dict[str, Any]):
+        settings = validate_settings(settings)
         with self.get_db() as conn:
             cursor = conn.cursor()
             for key, value in settings.items():
@@ -515,4 +1569,5 @@ class Database:
                     VALUES (?, ?)
                 ''', (key, json.dumps(value)))
             conn.commit()
-            return self.get_settings()
+            # get_settings() would check out a second connection while this one is held
+            return self.settings(cursor).to_dict()
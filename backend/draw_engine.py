@@ -0,0 +1,104 @@
+import random
+from typing import List, Dict, Any, Optional, Sequence, Union
+
+from roster import CompactRoster
+
+class FenwickTree:
+    """Binary indexed tree over non-negative integer weights.
+
+    Supports O(log n) point updates and O(log n) selection of the slot that
+    owns a given offset into the cumulative weight.
+    """
+
+    def __init__(self, weights: Sequence[int]):
+        self.size = len(weights)
+        self.tree = [0] * (self.size + 1)
+        self.weights = list(weights)
+        # O(n) construction: push each node's partial sum to its parent
+        for i, weight in enumerate(self.weights, start=1):
+            self.tree[i] += weight
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+        self.total = sum(self.weights)
+        self._top_bit = 1 << (self.size.bit_length() - 1) if self.size else 0
+
+    def update(self, index: int, delta: int):
+        self.weights[index] += delta
+        self.total += delta
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, offset: int) -> int:
+        """Return the index whose cumulative range contains `offset` (0 <= offset < total)."""
+        pos = 0
+        step = self._top_bit
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self.tree[nxt] <= offset:
+                pos = nxt
+                offset -= self.tree[nxt]
+            step >>= 1
+        return pos
+
+class DrawEngine:
+    """Weighted draw over a raffle roster.
+
+    Applies the same eligibility rules as the original pick_winner:
+    - allow_multiple_wins on: everyone with prizes < tickets is eligible and
+      has an equal chance.
+    - allow_multiple_wins off: only participants without a prize are
+      eligible, weighted by their remaining tickets.
+
+    Winners are drawn without materializing one entry per ticket, and
+    recording a win updates the weights in O(log n).
+
+    `participants` is a list of participant dicts or a CompactRoster; a
+    roster's prize_counts are updated in place as wins are recorded.
+    """
+
+    def __init__(self, participants: Union[List[Dict[str, Any]], CompactRoster], allow_multiple_wins: bool,
+                 rng: Optional[random.Random] = None):
+        self.participants = participants
+        self.allow_multiple_wins = allow_multiple_wins
+        self.rng = rng or random
+        if isinstance(participants, CompactRoster):
+            self.tickets = participants.tickets
+            self.prize_counts = participants.prize_counts
+        else:
+            self.tickets = [p['tickets'] for p in participants]
+            self.prize_counts = [
+                p['prize_count'] if 'prize_count' in p else len(p['prizes'])
+                for p in participants
+            ]
+        if allow_multiple_wins:
+            weights = [1 if c < t else 0 for t, c in zip(self.tickets, self.prize_counts)]
+        else:
+            weights = [t if c == 0 else 0 for t, c in zip(self.tickets, self.prize_counts)]
+        self.tree = FenwickTree(weights)
+
+    def _weight(self, index: int) -> int:
+        tickets = self.tickets[index]
+        prize_count = self.prize_counts[index]
+        if self.allow_multiple_wins:
+            return 1 if prize_count < tickets else 0
+        return tickets if prize_count == 0 else 0
+
+    @property
+    def total_weight(self) -> int:
+        return self.tree.total
+
+    def pick(self) -> Optional[int]:
+        """Return the roster index of a randomly drawn participant, or None if nobody is eligible."""
+        if self.tree.total <= 0:
+            return None
+        return self.tree.find(self.rng.randrange(self.tree.total))
+
+    def record_win(self, index: int):
+        self.prize_counts[index] += 1
+        new_weight = self._weight(index)
+        delta = new_weight - self.tree.weights[index]
+        if delta:
+            self.tree.update(index, delta)
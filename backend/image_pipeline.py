@@ -0,0 +1,86 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, List, Optional
+
+import cv2
+
+# Variant name -> longest edge in pixels, smallest first
+VARIANTS = {
+    'thumb': 256,
+    'display': 720,
+}
+
+# Output formats and their cv2 quality flags
+FORMATS = {
+    'jpg': (cv2.IMWRITE_JPEG_QUALITY, 82),
+    'webp': (cv2.IMWRITE_WEBP_QUALITY, 80),
+}
+
+def variant_filename(filename: str, variant: str, fmt: str) -> str:
+    base, _ = os.path.splitext(filename)
+    return f"{base}.{variant}.{fmt}"
+
+def choose_variant(size: Optional[str] = None, width: Optional[int] = None) -> Optional[str]:
+    """Pick the smallest variant covering the requested size, or None for the original."""
+    if size:
+        return size if size in VARIANTS else None
+    if width:
+        for variant, edge in VARIANTS.items():
+            if edge >= width:
+                return variant
+    return None
+
+class ImagePipeline:
+    """Generates resized, re-encoded variants of uploaded photos off the request thread."""
+
+    def __init__(self, workers: int = 2):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-pipeline')
+
+    def submit(self, path: str) -> Future:
+        return self.executor.submit(self.process, path)
+
+    def process(self, path: str) -> List[str]:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            # Unsupported by OpenCV (e.g. GIF) or not an image; the original is served instead
+            return []
+
+        folder, filename = os.path.split(path)
+        height, width = image.shape[:2]
+        written = []
+        for variant, edge in VARIANTS.items():
+            scale = min(1.0, edge / max(height, width))
+            if scale < 1.0:
+                resized = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                                     interpolation=cv2.INTER_AREA)
+            else:
+                resized = image
+            for fmt, (flag, quality) in FORMATS.items():
+                target = os.path.join(folder, variant_filename(filename, variant, fmt))
+                ok, encoded = cv2.imencode(f'.{fmt}', resized, [flag, quality])
+                if not ok:
+                    continue
+                # Write then rename so readers never see a partial variant
+                tmp_path = f"{target}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(encoded.tobytes())
+                os.replace(tmp_path, target)
+                written.append(target)
+        return written
+
+    def variant_paths(self, path: str) -> Dict[str, str]:
+        folder, filename = os.path.split(path)
+        return {
+            f"{variant}.{fmt}": os.path.join(folder, variant_filename(filename, variant, fmt))
+            for variant in VARIANTS
+            for fmt in FORMATS
+        }
+
+    def remove(self, path: str):
+        """Delete an original photo and any generated variants."""
+        for candidate in [path, *self.variant_paths(path).values()]:
+            if os.path.exists(candidate):
+                os.remove(candidate)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,86 @@
+import json
+from typing import Any, Iterable, Iterator
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+# Items encoded per chunk of a streamed array
+STREAM_BATCH = 500
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson when it is installed.
+
+    Output follows DefaultJSONProvider: keys sorted, and dates, dataclasses
+    and anything else orjson does not handle natively go through the same
+    `default` hook. orjson writes non-ASCII text as UTF-8 rather than
+    escaping it. Without orjson, compact output reuses one stdlib encoder
+    rather than building a new one per call. Calls with extra json.dumps
+    arguments, and values orjson rejects (such as integers over 64 bits),
+    fall back to the stdlib.
+    """
+
+    use_orjson = orjson is not None
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._encoder = None
+
+    def _options(self) -> int:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def _pretty(self) -> bool:
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        """Compact UTF-8 JSON for `obj`."""
+        if self.use_orjson:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._options())
+            except TypeError:
+                pass
+        if self._encoder is None:
+            self._encoder = json.JSONEncoder(separators=(',', ':'), default=self.default,
+                                             ensure_ascii=self.ensure_ascii, sort_keys=self.sort_keys)
+        return self._encoder.encode(obj).encode('utf-8')
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if self._pretty():
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+    def iter_array(self, items: Iterable[Any], batch: int = STREAM_BATCH) -> Iterator[bytes]:
+        """Encode `items` as one JSON array, yielded `batch` items at a time.
+
+        Each chunk is a single encoder call on a list, with its brackets cut
+        off, so memory stays at one batch however many items there are.
+        """
+        yield b'['
+        separator = b''
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= batch:
+                yield separator + self.dumps_bytes(chunk)[1:-1]
+                separator = b','
+                chunk = []
+        if chunk:
+            yield separator + self.dumps_bytes(chunk)[1:-1]
+        yield b']\n'
@@ -0,0 +1,107 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from photo_store import CONTENT_NAME
+
+logger = logging.getLogger(__name__)
+
+class PhotoCollector:
+    """Background removal of photos that no participant or prize refers to.
+
+    Each pass handles every open raffle in two small steps:
+
+    - paths whose reference count in photo_refs dropped to 0 at least `grace`
+      seconds ago are claimed and their files (with variants) removed;
+    - the next `batch` content-addressed files of each photo folder are checked
+      against the live references, which catches uploads that were never saved
+      on a participant or prize.
+
+    A file is only removed once it is `grace` seconds old. Identical re-uploads
+    refresh the file's mtime, so a photo that is about to be referenced again
+    is left alone.
+    """
+
+    def __init__(self, raffles: Callable[[], Iterable], grace: float = 600.0, interval: float = 60.0,
+                 batch: int = 200):
+        self.raffles = raffles
+        self.grace = grace
+        self.interval = interval
+        self.batch = batch
+        self.removed = 0
+        # Per photo folder: last file name the sweep looked at
+        self._sweep_after = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='photo-gc', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.collect()
+            except Exception:
+                # A closed or busy raffle is retried on the next pass
+                logger.exception('photo collection failed')
+
+    def collect(self, now: Optional[float] = None) -> int:
+        """One pass over every open raffle; returns the number of photos removed."""
+        now = time.time() if now is None else now
+        removed = 0
+        for raffle in self.raffles():
+            stores = {'participants': raffle.participant_photos, 'prizes': raffle.prize_photos}
+            for path in raffle.db.claim_released_photos(now - self.grace, self.batch):
+                kind, filename = path.split('/')[-2:]
+                store = stores.get(kind)
+                if store is not None and self._expired(store, filename, now):
+                    store.remove(filename)
+                    removed += 1
+
+            referenced = set()
+            for path in raffle.db.referenced_photos():
+                kind, filename = path.split('/')[-2:]
+                referenced.add((kind, filename[:32]))
+            for kind, store in stores.items():
+                removed += self._sweep(kind, store, referenced, now)
+        self.removed += removed
+        return removed
+
+    def _expired(self, store, filename: str, now: float) -> bool:
+        try:
+            return os.path.getmtime(store.path(filename)) <= now - self.grace
+        except OSError:
+            # Already gone; variants may still need removing
+            return True
+
+    def _sweep(self, kind: str, store, referenced: set, now: float) -> int:
+        after = self._sweep_after.get(store.folder, '')
+        try:
+            names = sorted(name for name in os.listdir(store.folder) if name > after and CONTENT_NAME.match(name))
+        except FileNotFoundError:
+            return 0
+        names = names[:self.batch]
+        # Start over from the top once the end of the folder is reached
+        self._sweep_after[store.folder] = names[-1] if len(names) == self.batch else ''
+
+        removed = 0
+        for name in names:
+            # Variants share their original's content hash
+            if (kind, name[:32]) in referenced or not self._expired(store, name, now):
+                continue
+            try:
+                os.remove(store.path(name))
+            except FileNotFoundError:
+                continue
+            if store.cache is not None:
+                store.cache.discard(store.path(name))
+            removed += 1
+        return removed
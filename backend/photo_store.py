@@ -0,0 +1,184 @@
+import hashlib
+import itertools
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from image_pipeline import ImagePipeline, variant_filename
+
+# Content-addressed names: 32 hex chars of the SHA-256 of the original bytes
+CONTENT_NAME = re.compile(r'^[0-9a-f]{32}(\.[a-z]+)*\.[a-z0-9]+$')
+
+CHUNK_SIZE = 64 * 1024
+
+# Uploads larger than this are rejected while they stream in
+MAX_PHOTO_BYTES = 10 * 1024 * 1024
+
+def sniff_image(header: bytes) -> Optional[str]:
+    """File extension for an image's magic bytes, or None if it isn't a supported image."""
+    if header.startswith(b'\xff\xd8\xff'):
+        return '.jpg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return '.png'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return '.gif'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return '.webp'
+    return None
+
+class BytesLRU:
+    """Thread-safe LRU of file contents bounded by total size in bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def discard(self, key: str):
+        with self._lock:
+            data = self._entries.pop(key, None)
+            if data is not None:
+                self.size -= len(data)
+
+class PhotoStore:
+    """Photos in one upload folder, named by a hash of their content.
+
+    Since a name can never point at different bytes, content-addressed files
+    (and the variants derived from them) are safe to cache as immutable.
+    """
+
+    def __init__(self, folder: str, pipeline: ImagePipeline, cache: Optional[BytesLRU] = None):
+        self.folder = folder
+        self.pipeline = pipeline
+        self.cache = cache
+        # Bytes of new (non-duplicate) originals written since startup
+        self.bytes_written = 0
+        os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def is_content_addressed(filename: str) -> bool:
+        return bool(CONTENT_NAME.match(filename))
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.folder, filename)
+
+    def _commit(self, tmp_path: str, digest: str, ext: str) -> str:
+        filename = f"{digest[:32]}{ext.lower()}"
+        target = self.path(filename)
+        if os.path.exists(target):
+            # Identical content is already stored; a fresh mtime keeps the photo
+            # collector off it until the new reference is saved
+            os.remove(tmp_path)
+            os.utime(target)
+        else:
+            os.replace(tmp_path, target)
+            self.bytes_written += os.path.getsize(target)
+            self.pipeline.submit(target)
+        return filename
+
+    def save_bytes(self, data: bytes, ext: str) -> str:
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, suffix='.upload')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return self._commit(tmp_path, hashlib.sha256(data).hexdigest(), ext)
+
+    def save_stream(self, stream, ext: str, max_bytes: Optional[int] = None, first: bytes = b'') -> str:
+        """Copy a file-like object to disk in chunks, hashing as it goes.
+
+        `first` is data already read from the stream. Raises ValueError once
+        more than `max_bytes` have been read; nothing is kept in that case.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in itertools.chain((first,), iter(lambda: stream.read(CHUNK_SIZE), b'')):
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise ValueError(f'Photo is larger than {max_bytes // (1024 * 1024)} MB')
+                    digest.update(chunk)
+                    f.write(chunk)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        return self._commit(tmp_path, digest.hexdigest(), ext)
+
+    def save_upload(self, stream, max_bytes: int = MAX_PHOTO_BYTES) -> str:
+        """Store an uploaded image without holding it in memory.
+
+        The extension comes from the image header rather than the client, and
+        anything that isn't a JPEG, PNG, GIF or WebP is refused with ValueError.
+        """
+        first = stream.read(CHUNK_SIZE)
+        ext = sniff_image(first)
+        if ext is None:
+            raise ValueError('Photo must be a JPEG, PNG, GIF or WebP image')
+        return self.save_stream(stream, ext, max_bytes, first)
+
+    def remove(self, filename: str):
+        """Delete a photo and its generated variants.
+
+        Photos may be shared through deduplication; only the photo collector
+        calls this, once nothing refers to the file any more.
+        """
+        path = self.path(filename)
+        self.pipeline.remove(path)
+        if self.cache is not None:
+            self.cache.discard(path)
+            for variant_path in self.pipeline.variant_paths(path).values():
+                self.cache.discard(variant_path)
+
+    def resolve(self, filename: str, variant: Optional[str], formats: List[str]) -> Tuple[Optional[str], bool]:
+        """Return (filename to serve, immutable) for a request.
+
+        Falls back to the original while a requested variant is still being
+        generated; that response must not be cached as immutable because the
+        URL will later serve the variant.
+        """
+        if not filename or os.path.basename(filename) != filename or filename.startswith('.'):
+            return None, False
+        if variant:
+            for fmt in formats:
+                candidate = variant_filename(filename, variant, fmt)
+                if os.path.exists(self.path(candidate)):
+                    return candidate, self.is_content_addressed(filename)
+        if not os.path.exists(self.path(filename)):
+            return None, False
+        return filename, self.is_content_addressed(filename) and not variant
+
+    def read(self, filename: str) -> bytes:
+        path = self.path(filename)
+        if self.cache is not None:
+            data = self.cache.get(path)
+            if data is not None:
+                return data
+        with open(path, 'rb') as f:
+            data = f.read()
+        if self.cache is not None:
+            self.cache.put(path, data)
+        return data
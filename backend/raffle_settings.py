@@ -0,0 +1,47 @@
+import json
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Mapping
+
+@dataclass(frozen=True)
+class RaffleSettings:
+    """Parsed raffle settings; values are stored as JSON text in the settings table."""
+
+    auto_prize_selection: bool = True
+    allow_multiple_wins: bool = True
+    # Keys this version doesn't know about, passed through unchanged
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_rows(cls, rows: Mapping[str, str]) -> 'RaffleSettings':
+        known = {f.name for f in fields(cls)} - {'extra'}
+        values = {}
+        extra = {}
+        for key, raw in rows.items():
+            value = parse_setting(raw)
+            if key in known:
+                values[key] = bool(value)
+            else:
+                extra[key] = value
+        return cls(extra=extra, **values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = dict(self.extra)
+        for f in fields(self):
+            if f.name != 'extra':
+                result[f.name] = getattr(self, f.name)
+        return result
+
+def parse_setting(value: str) -> Any:
+    try:
+        return json.loads(value.lower())
+    except json.JSONDecodeError:
+        return value
+
+def validate_settings(data: Any) -> Dict[str, Any]:
+    """Check an update against the typed settings; returns the values to store."""
+    if not isinstance(data, dict):
+        raise ValueError('Settings must be an object')
+    for f in fields(RaffleSettings):
+        if f.name in data and f.name != 'extra' and not isinstance(data[f.name], bool):
+            raise ValueError(f'{f.name} must be true or false')
+    return data
@@ -0,0 +1,186 @@
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from broadcaster import Broadcaster
+from database import Database
+from image_pipeline import ImagePipeline
+from photo_store import BytesLRU, PhotoStore
+
+# Event ids double as directory names
+RAFFLE_ID = re.compile(r'^[a-z0-9][a-z0-9_-]{0,63}$')
+
+class Raffle:
+    """Everything that belongs to one event: its database, photo folders and push channel."""
+
+    def __init__(self, raffle_id: str, db: Database, upload_folder: str, pipeline: ImagePipeline,
+                 photo_cache: Optional[BytesLRU] = None, url_prefix: str = '/api'):
+        self.id = raffle_id
+        self.db = db
+        self.url_prefix = url_prefix
+        self.upload_folder = upload_folder
+        self.participant_photos = PhotoStore(os.path.join(upload_folder, 'participants'), pipeline, photo_cache)
+        self.prize_photos = PhotoStore(os.path.join(upload_folder, 'prizes'), pipeline, photo_cache)
+        self.broadcaster = Broadcaster()
+        # Requests holding this raffle, counted by RaffleRegistry under its lock
+        self.users = 0
+
+    def photo_url(self, kind: str, filename: str) -> str:
+        return f"{self.url_prefix}/uploads/{kind}/{filename}"
+
+    def counters(self) -> Dict[str, float]:
+        """Monotonic totals exported by /api/metrics; the registry keeps them after close."""
+        pool = self.db.pool
+        tracer = self.db.tracer
+        return {
+            'photo_bytes_written': self.participant_photos.bytes_written + self.prize_photos.bytes_written,
+            'pool_waits': pool.waits,
+            'pool_wait_seconds': pool.wait_seconds,
+            'statements': tracer.statements if tracer is not None else 0,
+            'slow_queries': tracer.slow_count if tracer is not None else 0,
+        }
+
+    def close(self):
+        self.broadcaster.close()
+        self.db.close()
+
+class RaffleRegistry:
+    """Catalog of events, each stored in its own directory under `root`.
+
+    <root>/catalog.db lists the events; <root>/<id>/raffle.db and
+    <root>/<id>/uploads/ hold each event's data, so a large past event never
+    slows down the current one. At most `max_open` events keep an open
+    Database; the least recently used one is evicted when another is opened.
+    The default raffle (the unscoped /api routes) is never evicted.
+
+    get() leases a raffle to its caller until release(). An evicted raffle
+    closes its push channel at once, which ends its SSE streams, but its
+    database stays open until the last lease is returned.
+    """
+
+    def __init__(self, root: str, pipeline: ImagePipeline, photo_cache: Optional[BytesLRU] = None,
+                 max_open: int = 8, **db_options: Any):
+        self.root = root
+        self.pipeline = pipeline
+        self.photo_cache = photo_cache
+        self.max_open = max_open
+        self.db_options = db_options
+        self.default: Optional[Raffle] = None
+        self._open = OrderedDict()
+        # Evicted raffles still leased to requests
+        self._closing = set()
+        # Counter totals of raffles that have been closed
+        self._retired: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._catalog = sqlite3.connect(os.path.join(root, 'catalog.db'), check_same_thread=False)
+        self._catalog.row_factory = sqlite3.Row
+        with self._catalog:
+            self._catalog.execute('''
+                CREATE TABLE IF NOT EXISTS raffles (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+    def build(self, raffle_id: str, db_path: str, upload_folder: str, url_prefix: str = '/api') -> Raffle:
+        return Raffle(raffle_id, Database(db_path, **self.db_options), upload_folder,
+                      self.pipeline, self.photo_cache, url_prefix)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._catalog.execute('SELECT id, name, created_at FROM raffles ORDER BY created_at DESC, id').fetchall()
+        return [dict(row) for row in rows]
+
+    def create(self, raffle_id: str, name: str) -> Dict[str, Any]:
+        if not RAFFLE_ID.match(raffle_id or ''):
+            raise ValueError('Raffle id must be lowercase letters, digits, "-" or "_"')
+        if not name:
+            raise ValueError('Raffle name is required')
+        with self._lock:
+            try:
+                with self._catalog:
+                    self._catalog.execute('INSERT INTO raffles (id, name) VALUES (?, ?)', (raffle_id, name))
+            except sqlite3.IntegrityError:
+                raise ValueError('A raffle with this id already exists')
+            row = self._catalog.execute('SELECT id, name, created_at FROM raffles WHERE id = ?', (raffle_id,)).fetchone()
+        return dict(row)
+
+    def get(self, raffle_id: str) -> Optional[Raffle]:
+        """Lease the open handles for a catalogued event, or None if there is no such event.
+
+        Every raffle returned must be handed back with release().
+        """
+        evicted = []
+        with self._lock:
+            raffle = self._open.get(raffle_id)
+            if raffle is not None:
+                self._open.move_to_end(raffle_id)
+                raffle.users += 1
+                return raffle
+            if not RAFFLE_ID.match(raffle_id) or self._catalog.execute(
+                    'SELECT 1 FROM raffles WHERE id = ?', (raffle_id,)).fetchone() is None:
+                return None
+
+            folder = os.path.join(self.root, raffle_id)
+            os.makedirs(folder, exist_ok=True)
+            raffle = self.build(raffle_id, os.path.join(folder, 'raffle.db'), os.path.join(folder, 'uploads'),
+                                url_prefix=f'/api/events/{raffle_id}')
+            raffle.users = 1
+            self._open[raffle_id] = raffle
+            while len(self._open) > self.max_open:
+                old = self._open.popitem(last=False)[1]
+                if old.users:
+                    self._closing.add(old)
+                else:
+                    self._retire(old)
+                evicted.append(old)
+        for old in evicted:
+            # Requests still holding it keep the database until they release it
+            if old in self._closing:
+                old.broadcaster.close()
+            else:
+                old.close()
+        return raffle
+
+    def release(self, raffle: Raffle):
+        """Return a lease taken by get(); closes an evicted raffle once nobody holds it."""
+        with self._lock:
+            raffle.users -= 1
+            if raffle.users > 0 or raffle not in self._closing:
+                return
+            self._closing.discard(raffle)
+            self._retire(raffle)
+        raffle.close()
+
+    def _retire(self, raffle: Raffle):
+        # Called under the lock as the raffle leaves the registry, so totals never dip
+        for name, value in raffle.counters().items():
+            self._retired[name] = self._retired.get(name, 0) + value
+
+    def counter_totals(self) -> Dict[str, float]:
+        """Raffle.counters() summed over every raffle opened so far, closed ones included."""
+        with self._lock:
+            totals = dict(self._retired)
+            live = ([self.default] if self.default else []) + list(self._open.values()) + list(self._closing)
+            for raffle in live:
+                for name, value in raffle.counters().items():
+                    totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def open_raffles(self) -> List[Raffle]:
+        with self._lock:
+            return ([self.default] if self.default else []) + list(self._open.values())
+
+    def close(self):
+        with self._lock:
+            raffles = list(self._open.values()) + list(self._closing)
+            self._open.clear()
+            self._closing.clear()
+            self._catalog.close()
+        for raffle in raffles:
+            raffle.close()
@@ -0,0 +1,37 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+_MISSING = object()
+
+class VersionedCache:
+    """Bounded LRU mapping of key -> (version, value).
+
+    A lookup only hits when the stored version equals the caller's current
+    version, so bumping the version invalidates every entry at once without
+    walking the cache.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING or entry[0] != version:
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, version: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
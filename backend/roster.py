@@ -0,0 +1,119 @@
+import sqlite3
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+# Rows fetched per step while loading
+LOAD_BATCH = 10000
+
+class CompactRoster:
+    """Draw-time copy of the participants table in parallel arrays.
+
+    Slot i holds ids[i], tickets[i], prize_counts[i] and names[name_ids[i]],
+    sorted by id. Names go through an interned table, so repeated names are
+    stored once. That is about 30 bytes per participant plus the names,
+    instead of a dict per participant rebuilt on every draw.
+
+    The roster is loaded once and then kept current from the change log:
+    sync() re-reads only the participants that changed since `version`.
+    Deleted participants stay behind as zero-ticket slots, which no draw
+    rule picks, until enough of them pile up to warrant a reload.
+    """
+
+    def __init__(self):
+        self.ids = array('q')
+        self.tickets = array('q')
+        self.prize_counts = array('q')
+        self.name_ids = array('I')
+        self.names: List[str] = []
+        self._name_index: Dict[str, int] = {}
+        self.deleted = 0
+        # Change-log version the arrays reflect; None until loaded
+        self.version: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def reset(self):
+        """Drop everything; the next sync() reloads from the table."""
+        self.__init__()
+
+    def _intern(self, name: str) -> int:
+        index = self._name_index.get(name)
+        if index is None:
+            index = self._name_index[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def name(self, index: int) -> str:
+        return self.names[self.name_ids[index]]
+
+    def find(self, participant_id: int) -> Optional[int]:
+        """Slot of a participant, or None if it is not in the roster."""
+        index = bisect_left(self.ids, participant_id)
+        if index < len(self.ids) and self.ids[index] == participant_id:
+            return index
+        return None
+
+    def _append(self, row: sqlite3.Row):
+        self.ids.append(row['id'])
+        self.tickets.append(row['tickets'])
+        self.prize_counts.append(row['prize_count'])
+        self.name_ids.append(self._intern(row['name']))
+
+    def load(self, cursor: sqlite3.Cursor, version: int):
+        """Read the whole table; the caller's transaction must be at change-log `version`."""
+        self.reset()
+        cursor.execute('SELECT id, name, tickets, prize_count FROM participants ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(LOAD_BATCH)
+            if not rows:
+                break
+            for row in rows:
+                self._append(row)
+        self.version = version
+
+    def sync(self, cursor: sqlite3.Cursor):
+        """Bring the roster up to the change-log version of the caller's transaction."""
+        cursor.execute('SELECT COALESCE(MAX(version), 0) FROM changes')
+        version = cursor.fetchone()[0]
+        cursor.execute('SELECT compacted_through FROM change_log WHERE id = 1')
+        horizon = cursor.fetchone()[0]
+        # Never loaded, behind compacted tombstones, or the log went backwards
+        if self.version is None or self.version < horizon or version < self.version:
+            self.load(cursor, version)
+            return
+        if version == self.version:
+            return
+
+        cursor.execute('''
+            SELECT c.id, p.name, p.tickets, p.prize_count
+            FROM (
+                SELECT DISTINCT CAST(entity_id AS INTEGER) AS id
+                FROM changes
+                WHERE version > ? AND entity = 'participant'
+            ) c
+            LEFT JOIN participants p ON p.id = c.id
+            ORDER BY c.id
+        ''', (self.version,))
+        for row in cursor.fetchall():
+            index = self.find(row['id'])
+            if row['name'] is None:
+                if index is not None and self.tickets[index]:
+                    self.tickets[index] = 0
+                    self.deleted += 1
+            elif index is not None:
+                self.tickets[index] = row['tickets']
+                self.prize_counts[index] = row['prize_count']
+                self.name_ids[index] = self._intern(row['name'])
+            elif not self.ids or row['id'] > self.ids[-1]:
+                self._append(row)
+            else:
+                # An id below the newest one appeared; only a reload keeps the order
+                self.load(cursor, version)
+                return
+
+        if self.deleted > len(self.ids) // 2:
+            self.load(cursor, version)
+        else:
+            self.version = version
@@ -0,0 +1,227 @@
+"""Monte Carlo simulation of the pick_winner draw rules.
+
+    python simulator.py raffle.db --trials 1000000 --seed 7
+    python simulator.py raffle.db --trials 200000 --no-auto-select --top 50
+
+Replays whole ceremonies (every remaining prize unit drawn with
+pick_winner) on a snapshot of the roster, many trials at a time with NumPy,
+and prints each participant's chance of winning next to their tickets.
+"""
+import argparse
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Cells of the (trials x classes x wins) working arrays per batch
+BATCH_CELLS = 4_000_000
+
+class DrawSimulator:
+    """Vectorized replay of Database.draw_winner on a roster snapshot.
+
+    The rules are the ones draw_winner applies:
+
+    - with allow_multiple_wins, everyone with tickets left over their prize
+      count is eligible and all of them are equally likely;
+    - without it, only participants without a prize are eligible, weighted
+      by their tickets;
+    - with auto_select, each draw first picks uniformly among the prizes that
+      have units left; otherwise prizes are drawn in list order, one unit per
+      draw, like a presenter calling pick_winner for each prize in turn.
+
+    A trial ends when no prize units are left or nobody is eligible (where
+    pick_winner would answer with an error). Prizes already assigned in the
+    snapshot count towards the limits, so a simulation can start mid-ceremony.
+
+    Participants who start with the same tickets and prize count are
+    interchangeable under these rules, so a trial tracks how many members of
+    each such class have won 0, 1, 2... prizes rather than every participant.
+    A draw picks a cell weighted by members times per-member weight, which
+    is exactly the roster-level draw; its cost depends on the number of
+    classes, not the size of the roster.
+    """
+
+    def __init__(self, participants: List[Dict[str, Any]], prizes: List[Dict[str, Any]],
+                 allow_multiple_wins: bool, seed: Optional[int] = None):
+        self.participants = participants
+        self.prizes = prizes
+        self.allow_multiple_wins = allow_multiple_wins
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.remaining = np.array([p['remaining'] for p in prizes], dtype=np.int64)
+
+        state = np.array([(p['tickets'], len(p['prizes'])) for p in participants], dtype=np.int64).reshape(-1, 2)
+        classes, self.member_class, self.class_sizes = np.unique(
+            state, axis=0, return_inverse=True, return_counts=True)
+        self.member_class = self.member_class.reshape(-1)
+        tickets, held = classes[:, 0:1], classes[:, 1:2]
+        # Further wins a member of each class can take, and its weight after `extra` of them
+        max_extra = int((tickets - held).max(initial=0)) if allow_multiple_wins else 1
+        extra = np.arange(max_extra + 1)[None, :]
+        if allow_multiple_wins:
+            self.cell_weights = (tickets > held + extra).astype(np.int64)
+        else:
+            self.cell_weights = np.where(held + extra == 0, tickets, 0)
+
+    @classmethod
+    def from_database(cls, db, seed: Optional[int] = None,
+                      allow_multiple_wins: Optional[bool] = None) -> 'DrawSimulator':
+        if allow_multiple_wins is None:
+            allow_multiple_wins = db.settings().allow_multiple_wins
+        return cls(db.get_participants(), db.get_prizes(), allow_multiple_wins, seed)
+
+    def next_draw_probabilities(self) -> np.ndarray:
+        """Exact chance of each participant winning the next draw."""
+        weights = self.cell_weights[:, 0] if len(self.class_sizes) else np.zeros(0, dtype=np.int64)
+        total = (weights * self.class_sizes).sum()
+        member = weights[self.member_class]
+        return member / total if total else member.astype(float)
+
+    def _pick(self, weights: np.ndarray) -> np.ndarray:
+        """One weighted pick per row of `weights`; every row needs some weight."""
+        cumulative = np.cumsum(weights, axis=1)
+        totals = cumulative[:, -1]
+        # Offset each row past the previous one so a single searchsorted serves the batch
+        bases = np.concatenate(([0], np.cumsum(totals)[:-1]))
+        targets = bases + self.rng.integers(0, totals)
+        flat = (cumulative + bases[:, None]).ravel()
+        return np.searchsorted(flat, targets, side='right') - np.arange(len(weights)) * weights.shape[1]
+
+    def _run_batch(self, trials: int, auto_select: bool, stats: Dict[str, np.ndarray]) -> int:
+        classes, width = self.cell_weights.shape
+        # counts[trial, class, wins]: members of a class holding that many new prizes
+        counts = np.zeros((trials, classes, width), dtype=np.int64)
+        counts[:, :, 0] = self.class_sizes
+        remaining = np.repeat(self.remaining[None, :], trials, axis=0)
+        active = np.ones(trials, dtype=bool)
+        units = int(self.remaining.sum())
+        schedule = np.repeat(np.arange(len(self.remaining)), self.remaining)
+        draws = 0
+
+        for step in range(units):
+            rows = np.flatnonzero(active)
+            if not len(rows):
+                break
+            if auto_select:
+                available = remaining[rows] > 0
+                choice = self.rng.integers(0, available.sum(axis=1))
+                prize = np.argmax(np.cumsum(available, axis=1) > choice[:, None], axis=1)
+            else:
+                prize = np.full(len(rows), schedule[step])
+
+            weights = (counts[rows] * self.cell_weights).reshape(len(rows), -1)
+            eligible = weights.any(axis=1)
+            # No eligible participant: pick_winner errors and the ceremony is over
+            active[rows[~eligible]] = False
+            rows, prize, weights = rows[eligible], prize[eligible], weights[eligible]
+            if not len(rows):
+                break
+
+            cell = self._pick(weights)
+            winner_class, wins = np.divmod(cell, width)
+            counts[rows, winner_class, wins] -= 1
+            counts[rows, winner_class, wins + 1] += 1
+            remaining[rows, prize] -= 1
+            np.add.at(stats['prize_wins'], (winner_class, prize), 1)
+            if step == 0:
+                np.add.at(stats['first_draw'], winner_class, 1)
+            draws += len(rows)
+
+        stats['won_any'] += (self.class_sizes - counts[:, :, 0]).sum(axis=0)
+        stats['wins'] += (counts * np.arange(width)).sum(axis=(0, 2))
+        return draws
+
+    def run(self, trials: int, auto_select: bool = True) -> Dict[str, Any]:
+        """Simulate `trials` ceremonies; returns per-participant tables and throughput."""
+        if trials < 1:
+            raise ValueError('At least one trial is needed')
+        classes, width = self.cell_weights.shape if len(self.class_sizes) else (0, 1)
+        stats = {
+            'won_any': np.zeros(classes, dtype=np.int64),
+            'wins': np.zeros(classes, dtype=np.int64),
+            'first_draw': np.zeros(classes, dtype=np.int64),
+            'prize_wins': np.zeros((classes, len(self.remaining)), dtype=np.int64),
+        }
+        batch = max(1, BATCH_CELLS // max(classes * width, 1))
+        draws = 0
+        start = time.perf_counter()
+        if classes and len(self.remaining):
+            for first in range(0, trials, batch):
+                draws += self._run_batch(min(batch, trials - first), auto_select, stats)
+        elapsed = time.perf_counter() - start
+
+        # Class totals shared out over the class's members
+        per_member = trials * self.class_sizes
+        exact = self.next_draw_probabilities()
+        first_draw = stats['first_draw'] / per_member if classes else np.zeros(0)
+        table = []
+        for i, participant in enumerate(self.participants):
+            k = self.member_class[i]
+            table.append({
+                'id': participant['id'],
+                'name': participant['name'],
+                'tickets': participant['tickets'],
+                'prizes_held': len(participant['prizes']),
+                'next_draw_exact': float(exact[i]),
+                'next_draw_simulated': float(first_draw[k]),
+                'win_probability': float(stats['won_any'][k] / per_member[k]),
+                'expected_wins': float(stats['wins'][k] / per_member[k]),
+                'prizes': {prize['name']: float(stats['prize_wins'][k, j] / per_member[k])
+                           for j, prize in enumerate(self.prizes) if stats['prize_wins'][k, j]},
+            })
+
+        # Largest gap between a class's simulated and exact first-draw odds, in standard errors
+        z = 0.0
+        if classes:
+            expected = self.cell_weights[:, 0] * self.class_sizes
+            expected = expected / expected.sum() if expected.sum() else expected.astype(float)
+            error = np.sqrt(expected * (1 - expected) / trials)
+            observed = stats['first_draw'] / trials
+            z = float((np.abs(observed - expected) / np.where(error > 0, error, 1)).max())
+        return {
+            'trials': trials,
+            'seed': self.seed,
+            'allow_multiple_wins': self.allow_multiple_wins,
+            'auto_select': auto_select,
+            'classes': int(classes),
+            'draws': draws,
+            'seconds': round(elapsed, 3),
+            'draws_per_second': round(draws / elapsed) if elapsed else None,
+            'max_first_draw_z': z,
+            'participants': table,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('database')
+    parser.add_argument('--trials', type=int, default=100_000)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--no-auto-select', dest='auto_select', action='store_false',
+                        help='draw prizes in list order instead of picking one at random per draw')
+    wins = parser.add_mutually_exclusive_group()
+    wins.add_argument('--multiple-wins', dest='allow_multiple_wins', action='store_true', default=None)
+    wins.add_argument('--single-win', dest='allow_multiple_wins', action='store_false')
+    parser.add_argument('--top', type=int, default=20, help='participants to print, most likely winners first')
+    args = parser.parse_args()
+
+    from database import Database
+
+    db = Database(args.database)
+    try:
+        simulator = DrawSimulator.from_database(db, args.seed, args.allow_multiple_wins)
+    finally:
+        db.close()
+    result = simulator.run(args.trials, args.auto_select)
+
+    print(f"{result['trials']:,} ceremonies, {result['draws']:,} draws in {result['seconds']:.2f} s "
+          f"({result['draws_per_second'] or 0:,} draws/s); multiple wins "
+          f"{'on' if result['allow_multiple_wins'] else 'off'}, auto select {'on' if result['auto_select'] else 'off'}; "
+          f"first draw vs exact odds: max {result['max_first_draw_z']:.1f} standard errors")
+    print(f"{'name':30} {'tickets':>7} {'next draw':>10} {'simulated':>10} {'P(win)':>8} {'E[wins]':>8}")
+    rows = sorted(result['participants'], key=lambda row: row['win_probability'], reverse=True)
+    for row in rows[:args.top]:
+        print(f"{row['name'][:30]:30} {row['tickets']:>7} {row['next_draw_exact']:>10.4%} "
+              f"{row['next_draw_simulated']:>10.4%} {row['win_probability']:>8.2%} {row['expected_wins']:>8.3f}")
+
+if __name__ == '__main__':
+    main()
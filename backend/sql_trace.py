@@ -0,0 +1,101 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Statements that have no useful query plan
+_NO_PLAN_PREFIXES = ('BEGIN', 'COMMIT', 'ROLLBACK', 'END', 'PRAGMA', 'CREATE', 'DROP', 'ALTER', 'SAVEPOINT', 'RELEASE')
+
+class QueryTracer:
+    """Statement tracing for Database connections via sqlite3's set_trace_callback.
+
+    The callback fires when SQLite starts a statement, so a statement's time
+    runs until the next statement starts on the same connection or the
+    connection goes back to the pool. That includes fetching its rows, which is
+    what a request actually waits for. Statements slower than `slow_ms` are
+    logged with their EXPLAIN QUERY PLAN.
+
+    Statement counts are also kept per thread, so a request handler can reset
+    them on entry and report how many queries it issued (N+1 patterns show up
+    as counts that grow with the roster).
+    """
+
+    def __init__(self, db_path: str, slow_ms: float = 100.0, explain: bool = True, keep_slow: int = 50):
+        self.db_path = db_path
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self.statements = 0
+        self.slow_count = 0
+        self.slow_queries = deque(maxlen=keep_slow)
+        self._pending: Dict[sqlite3.Connection, List[Any]] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._explain_conn: Optional[sqlite3.Connection] = None
+
+    def attach(self, conn: sqlite3.Connection):
+        conn.set_trace_callback(lambda sql: self._on_statement(conn, sql))
+
+    def _on_statement(self, conn: sqlite3.Connection, sql: str):
+        now = time.perf_counter()
+        pending = self._pending.get(conn)
+        if pending is not None and pending[0] == sql:
+            # Trigger programs are reported with their parent statement's text
+            return
+        self._pending[conn] = [sql, now]
+        if pending is not None:
+            self._record(pending[0], now - pending[1])
+        with self._lock:
+            self.statements += 1
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def finish(self, conn: sqlite3.Connection):
+        """Close out the last statement of a connection checkout."""
+        pending = self._pending.pop(conn, None)
+        if pending is not None:
+            self._record(pending[0], time.perf_counter() - pending[1])
+
+    def begin_request(self):
+        self._local.count = 0
+
+    def request_query_count(self) -> int:
+        return getattr(self._local, 'count', 0)
+
+    def _record(self, sql: str, elapsed: float):
+        elapsed_ms = elapsed * 1000
+        if elapsed_ms < self.slow_ms:
+            return
+        plan = self.query_plan(sql) if self.explain else None
+        with self._lock:
+            self.slow_count += 1
+            self.slow_queries.append({'sql': sql, 'ms': round(elapsed_ms, 2), 'plan': plan})
+        logger.warning('slow query (%.1f ms): %s%s', elapsed_ms, ' '.join(sql.split()),
+                       ''.join(f'\n    {line}' for line in plan or []))
+
+    def query_plan(self, sql: str) -> Optional[List[str]]:
+        """EXPLAIN QUERY PLAN lines for an expanded statement, on a connection of its own."""
+        if sql.lstrip().upper().startswith(_NO_PLAN_PREFIXES):
+            return None
+        with self._lock:
+            try:
+                if self._explain_conn is None:
+                    self._explain_conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                rows = self._explain_conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+            except sqlite3.Error as e:
+                return [f'(no plan: {e})']
+        # Rows are (id, parent, notused, detail); indent children under parents
+        depth = {0: 0}
+        lines = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, 0) + 1
+            lines.append('  ' * (depth[node_id] - 1) + detail)
+        return lines
+
+    def close(self):
+        with self._lock:
+            if self._explain_conn is not None:
+                self._explain_conn.close()
+                self._explain_conn = None
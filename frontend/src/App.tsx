@@ -24,6 +24,17 @@ const API = {
   PRIZES: '/api/prizes'
 };
 
+// Webcam captures are data URLs; send them as binary file parts instead of base64 text.
+// Anything else (the current photo's URL) is passed through unchanged.
+const appendPhoto = async (formData: FormData, photo: string) => {
+  if (photo.startsWith('data:')) {
+    const blob = await (await fetch(photo)).blob();
+    formData.append('photo', blob, `webcam.${blob.type === 'image/png' ? 'png' : 'jpg'}`);
+  } else {
+    formData.append('photo', photo);
+  }
+};
+
 function App() {
   const [participants, setParticipants] = useState<Participant[]>([]);
   const [prizes, setPrizes] = useState<Prize[]>([]);
@@ -156,7 +167,7 @@ function App() {
       formData.append('name', participant.name || '');
       formData.append('tickets', participant.tickets?.toString() || '1');
       if (participant.photo_path) {
-        formData.append('photo', participant.photo_path);
+        await appendPhoto(formData, participant.photo_path);
       }
       const response = await fetch(API.ADD_PARTICIPANT, {
         method: 'POST',
@@ -186,7 +197,7 @@ function App() {
       formData.append('id', participant.id || '');
       if (participant.name) formData.append('name', participant.name);
       if (participant.tickets) formData.append('tickets', participant.tickets.toString());
-      if (participant.photo_path) formData.append('photo', participant.photo_path);
+      if (participant.photo_path) await appendPhoto(formData, participant.photo_path);
 
       const response = await fetch(API.EDIT_PARTICIPANT, {
         method: 'POST',
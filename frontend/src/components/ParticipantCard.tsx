@@ -46,7 +46,7 @@ const ParticipantCard: React.FC<ParticipantCardProps> = ({
                                shadow-lg border-4 border-white ring-2 ring-jungle-green/20 flex-shrink-0">
                     {participant.photo_path ? (
                       <img
-                        src={participant.photo_path}
+                        src={`${participant.photo_path}?size=thumb`}
                         alt={participant.name}
                         className="w-full h-full object-cover"
                       />
@@ -182,7 +182,7 @@ const PrizeManagement: React.FC<PrizeManagementProps> = ({
                   {prize.photo_path && (
                     <div className="aspect-video w-full overflow-hidden bg-jungle-beige">
                       <img
-                        src={prize.photo_path}
+                        src={`${prize.photo_path}?size=display`}
                         alt={prize.name}
                         className="w-full h-full object-cover"
                       />
@@ -54,7 +54,7 @@ const PrizePrompt = ({ isOpen, onClose, onSubmit, onAddPrize, onUpdatePrize, onD
                   <div className="flex items-start gap-4">
                     {prize.photo_path ? (
                       <img
-                        src={prize.photo_path}
+                        src={`${prize.photo_path}?size=thumb`}
                         alt={prize.name}
                         className="w-24 h-24 object-cover rounded-xl shadow-jungle"
                       />
@@ -102,7 +102,7 @@ const WinnerDisplay: React.FC<WinnerDisplayProps> = ({
               <div className="relative group flex-1 flex flex-col items-center justify-center">
                 {photo ? (
                   <img
-                    src={photo}
+                    src={`${photo}?size=display`}
                     alt={winner}
                     className="w-48 h-48 rounded-full object-cover mx-auto ring-4 ring-jungle-green ring-offset-4 
                              transform transition-all duration-300 group-hover:scale-105 shadow-jungle"
@@ -128,7 +128,7 @@ const WinnerDisplay: React.FC<WinnerDisplayProps> = ({
               <div className="relative group flex-1 flex flex-col items-center justify-center">
                 {prizePhoto ? (
                   <img
-                    src={prizePhoto}
+                    src={`${prizePhoto}?size=display`}
                     alt={prize}
                     className="w-48 h-48 rounded-full  object-cover mx-auto ring-4 ring-jungle-gold ring-offset-4 
                              transform transition-all duration-300 group-hover:scale-105 shadow-jungle"